@@ -6,6 +6,7 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 from main import SEMKeywordPipeline
+from src.keyword_frame import KeywordFrame
 import zipfile
 import io
 from datetime import datetime
@@ -130,6 +131,10 @@ def main():
                 search_weight = search_weight / total_weight
                 competition_weight = competition_weight / total_weight
                 cpc_weight = cpc_weight / total_weight
+            
+            resume = st.checkbox("Resume from checkpoints", value=False,
+                                 help="Skip steps whose settings and inputs haven't changed since the last run "
+                                      "(checkpoints expire after a day; fresh runs re-check the live sites)")
         
         # Run button
         run_pipeline = st.button("🚀 Generate Keywords", type="primary", use_container_width=True)
@@ -145,8 +150,21 @@ def main():
             unsafe_allow_html=True
         )
     
+    scoring_weights = {
+        'search_volume_weight': search_weight,
+        'competition_weight': competition_weight,
+        'cpc_weight': cpc_weight
+    }
+    
     # Main content area
-    if not run_pipeline:
+    if not run_pipeline and 'pipeline' in st.session_state:
+        # Weight slider changes re-rank the last run instead of rerunning the pipeline
+        pipeline = st.session_state['pipeline']
+        if pipeline.config['scoring'] != scoring_weights:
+            st.session_state['results'] = pipeline.rescore(scoring_weights)
+        display_results_and_downloads(*st.session_state['results'])
+    
+    elif not run_pipeline:
         st.info("👈 Configure your settings in the sidebar and click '**Generate Keywords**' to start")
         
         # Show example
@@ -207,11 +225,7 @@ def main():
                 'country': country,
                 'language': 'en'
             },
-            'scoring': {
-                'search_volume_weight': search_weight,
-                'competition_weight': competition_weight,
-                'cpc_weight': cpc_weight
-            }
+            'scoring': dict(scoring_weights)
         }
         
         # Run pipeline
@@ -227,11 +241,14 @@ def main():
             status_text.text("🔄 Running keyword research...")
             progress_bar.progress(50)
             
-            ad_groups, summary, download_files = pipeline.run_pipeline()
+            ad_groups, summary, download_files = pipeline.run_pipeline(resume=resume)
             
             progress_bar.progress(100)
             status_text.text("✅ Pipeline completed successfully!")
             
+            st.session_state['pipeline'] = pipeline
+            st.session_state['results'] = (ad_groups, summary, download_files)
+            
             # Display results
             display_results_and_downloads(ad_groups, summary, download_files)
             
@@ -347,14 +364,12 @@ def display_results_and_downloads(ad_groups, summary, download_files):
     
     # Top keywords preview
     if ad_groups:
-        all_keywords = []
-        for keywords in ad_groups.values():
-            all_keywords.extend(keywords)
+        all_keywords = KeywordFrame.concat([keywords.materialize() for keywords in ad_groups.values()]).sort_by_score()
         
         # Sort by score and show top 10
-        top_keywords = sorted(all_keywords, key=lambda x: x['score'], reverse=True)[:10]
+        top_keywords = all_keywords.take(range(min(10, len(all_keywords))))
         
-        df_preview = pd.DataFrame(top_keywords)
+        df_preview = top_keywords.to_dataframe()
         df_preview = df_preview[['keyword', 'avg_monthly_searches', 'competition', 'score', 'suggested_cpc_start']]
         df_preview['avg_monthly_searches'] = df_preview['avg_monthly_searches'].apply(lambda x: f"{x:,}")
         df_preview['suggested_cpc_start'] = df_preview['suggested_cpc_start'].apply(lambda x: f"₹{x:.2f}")
@@ -0,0 +1,196 @@
+import argparse
+import contextlib
+import copy
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import yaml
+
+from main import SEMKeywordPipeline
+from src.client_pool import shared
+from src.serp_client import ProcessTokenBucket
+
+# Campaign names become directory names under the output directory
+CAMPAIGN_NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,99}$')
+
+
+def load_campaigns(source: str, base_config: Dict = None) -> List[Tuple[str, Dict]]:
+    """(name, config) per campaign from a directory of YAML/JSON configs or a JSONL file.
+
+    Each campaign config is merged over base_config, so it only needs the keys
+    that differ (usually brand and competitor). A 'name' key names the campaign;
+    otherwise the file name (or JSONL line number) does.
+    """
+    source = Path(source)
+    campaigns = []
+    if source.is_dir():
+        for path in sorted(source.iterdir()):
+            if path.suffix in ('.yaml', '.yml', '.json'):
+                with open(path, 'r') as f:
+                    config = yaml.safe_load(f) or {}  # YAML is a superset of JSON; empty files load as None
+                campaigns.append(_named(config, path.stem, path.name))
+    else:
+        with open(source, 'r') as f:
+            for line_number, line in enumerate(f, 1):
+                if line.strip():
+                    campaigns.append(_named(json.loads(line), f"campaign_{line_number}", f"line {line_number}"))
+
+    names = [name for name, _ in campaigns]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate campaign names: {duplicates}")
+    return [(name, _merge(base_config or {}, config)) for name, config in campaigns]
+
+
+def _named(config, default_name: str, origin: str) -> Tuple[str, Dict]:
+    """(validated campaign name, config without its name key)"""
+    if not isinstance(config, dict):
+        raise ValueError(f"Campaign config in {origin} must be a mapping, got {type(config).__name__}")
+    name = str(config.pop('name', None) or default_name)
+    if not CAMPAIGN_NAME.match(name):
+        raise ValueError(f"Invalid campaign name {name!r} in {origin}: use letters, digits, '.', '_' and '-', "
+                         f"starting with a letter or digit")
+    return name, config
+
+
+def _merge(base: Dict, override: Dict) -> Dict:
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _init_worker(serp_limiter: ProcessTokenBucket, llm_limiter: ProcessTokenBucket) -> None:
+    """Register the pool-wide limiters before any pipeline asks for its own"""
+    shared(('rate_limiter', 'serp'), lambda: serp_limiter)
+    shared(('rate_limiter', 'llm'), lambda: llm_limiter)
+
+
+def run_campaign(name: str, config: Dict, output_dir: str, resume: bool = False) -> Dict:
+    """Run one campaign in a worker process and write its files under output_dir/name"""
+    campaign_dir = Path(output_dir) / name
+    started = time.perf_counter()
+    try:
+        campaign_dir.mkdir(parents=True, exist_ok=True)
+        # Workers run one campaign at a time, so the process-wide redirect is safe
+        with open(campaign_dir / 'pipeline.log', 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+            try:
+                pipeline = SEMKeywordPipeline(config_dict=config)
+                ad_groups, summary, download_files = pipeline.run_pipeline(resume=resume)
+            except Exception as e:
+                print(f"❌ Campaign failed: {type(e).__name__}: {e}")
+                raise
+
+        for filename, content in download_files.items():
+            with open(campaign_dir / filename, 'w', encoding='utf-8', newline='') as f:
+                f.write(content)
+    except Exception as e:
+        return _failed(name, e, started)
+
+    return {
+        'campaign': name,
+        'status': 'ok',
+        'total_keywords': summary['total_keywords'],
+        'files': sorted(download_files),
+        'duration': round(time.perf_counter() - started, 3),
+        'stage_timings': pipeline.stage_timings
+    }
+
+
+def _failed(name: str, error: BaseException, started: float) -> Dict:
+    return {'campaign': name, 'status': 'error', 'error': f"{type(error).__name__}: {error}",
+            'duration': round(time.perf_counter() - started, 3)}
+
+
+class BatchRunner:
+    """Runs many campaigns across a process pool under one set of API quotas.
+
+    Each worker process runs whole campaigns, so the CPU-bound stages (HTML
+    extraction, keyword processing, scoring, file generation) of different
+    campaigns use different cores, while each campaign's DAG still overlaps its
+    own network stages on threads. SERP and OpenAI requests from every worker
+    draw on shared-memory token buckets, so the configured rates are global;
+    the SQLite and file caches under the cache directory are shared on disk.
+    """
+
+    def __init__(self, output_dir: str = './data/batch', workers: int = None,
+                 serp_requests_per_second: float = 5.0, serp_burst: int = 10,
+                 llm_requests_per_second: float = 10.0, llm_burst: int = None, resume: bool = False):
+        self.output_dir = Path(output_dir)
+        self.workers = workers or os.cpu_count() or 1
+        self.serp_limiter = ProcessTokenBucket(serp_requests_per_second, serp_burst)
+        self.llm_limiter = ProcessTokenBucket(llm_requests_per_second, llm_burst)
+        self.resume = resume
+
+    def run(self, campaigns: List[Tuple[str, Dict]]) -> List[Dict]:
+        """Run every campaign; results are appended to batch_results.jsonl as each one finishes"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        results_path = self.output_dir / 'batch_results.jsonl'
+        workers = min(self.workers, len(campaigns)) or 1
+        print(f"🚀 Running {len(campaigns)} campaigns on {workers} worker processes...")
+
+        started = time.perf_counter()
+        results = []
+        with open(results_path, 'w', encoding='utf-8') as results_file, ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(self.serp_limiter, self.llm_limiter)
+        ) as executor:
+            futures = {
+                executor.submit(run_campaign, name, config, str(self.output_dir), self.resume): name
+                for name, config in campaigns
+            }
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # The worker died (BrokenProcessPool) or its result could not be sent back
+                    result = _failed(futures[future], e, started)
+                results.append(result)
+                results_file.write(json.dumps(result) + '\n')
+                results_file.flush()
+                if result['status'] == 'ok':
+                    print(f"✅ {result['campaign']}: {result['total_keywords']} keywords in {result['duration']:.1f}s "
+                          f"({len(results)}/{len(campaigns)})")
+                else:
+                    print(f"❌ {result['campaign']}: {result['error']} ({len(results)}/{len(campaigns)})")
+
+        failed = sum(1 for result in results if result['status'] != 'ok')
+        print(f"\n🏁 Batch finished in {time.perf_counter() - started:.1f}s: "
+              f"{len(results) - failed} succeeded, {failed} failed. Results in {results_path}")
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline for many campaigns in parallel")
+    parser.add_argument('campaigns', help="Directory of YAML/JSON campaign configs, or a JSONL file")
+    parser.add_argument('--base-config', default='config.yaml',
+                        help="Config every campaign is merged over")
+    parser.add_argument('--output', default='./data/batch')
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Reuse checkpointed stages whose config and inputs are unchanged")
+    args = parser.parse_args()
+
+    with open(args.base_config, 'r') as f:
+        base_config = yaml.safe_load(f)
+    serp_api = base_config.get('serp_api', {})
+    llm = base_config.get('llm', {})
+
+    runner = BatchRunner(
+        output_dir=args.output,
+        workers=args.workers,
+        serp_requests_per_second=serp_api.get('requests_per_second', 5.0),
+        serp_burst=serp_api.get('burst', 10),
+        llm_requests_per_second=llm.get('requests_per_second', 10),
+        llm_burst=llm.get('burst'),
+        resume=args.resume
+    )
+    results = runner.run(load_campaigns(args.campaigns, base_config))
+    raise SystemExit(1 if any(result['status'] != 'ok' for result in results) else 0)
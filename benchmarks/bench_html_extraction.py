@@ -0,0 +1,92 @@
+"""Compare HTML extraction backends on saved pages.
+
+Usage:
+    python benchmarks/bench_html_extraction.py saved_pages/*.html [--repeat 5]
+
+With no pages given, a synthetic ~2 MB e-commerce style homepage is used.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.html_extractor import available_backends, clean_text, extract_content
+
+
+def legacy_extract(html: bytes) -> dict:
+    """The multi-pass BeautifulSoup extraction scrape_website used to do"""
+    soup = BeautifulSoup(html, 'html.parser')
+    title = soup.find('title').get_text() if soup.find('title') else ""
+    meta_desc = ""
+    meta_tag = soup.find('meta', attrs={'name': 'description'})
+    if meta_tag:
+        meta_desc = meta_tag.get('content', '')
+    headings = {
+        'h1': [h.get_text().strip() for h in soup.find_all('h1')],
+        'h2': [h.get_text().strip() for h in soup.find_all('h2')],
+        'h3': [h.get_text().strip() for h in soup.find_all('h3')]
+    }
+    nav_items = []
+    for nav in soup.find_all(['nav', 'menu']):
+        nav_items.extend([link.get_text().strip() for link in nav.find_all('a') if link.get_text().strip()])
+    for script in soup(["script", "style"]):
+        script.decompose()
+    return {
+        'title': title,
+        'meta_description': meta_desc,
+        'headings': headings,
+        'navigation': nav_items,
+        'text': clean_text(soup.get_text())
+    }
+
+
+def synthetic_page(products: int = 16000) -> bytes:
+    nav = ''.join(f'<li><a href="/c/{i}">Category {i}</a></li>' for i in range(200))
+    cards = ''.join(
+        f'<div class="card"><h3>Product {i}</h3><p>Cotton shirt for men, size M, price Rs {i}</p>'
+        f'<script>track({i})</script></div>'
+        for i in range(products)
+    )
+    html = (
+        '<html><head><title>Shop Online</title>'
+        '<meta name="description" content="Fashion store"><style>body{}</style></head>'
+        f'<body><nav><ul>{nav}</ul></nav><h1>Big Sale</h1><h2>Trending</h2>{cards}</body></html>'
+    )
+    return html.encode('utf-8')
+
+
+def time_it(fn, html: bytes, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pages', nargs='*', help='Saved HTML files')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    pages = [(p, Path(p).read_bytes()) for p in args.pages] or [('synthetic', synthetic_page())]
+    contenders = {'bs4 multi-pass': legacy_extract}
+    for backend in available_backends():
+        contenders[f'single-pass {backend}'] = lambda html, b=backend: extract_content(html, backend=b)
+
+    for name, html in pages:
+        print(f"\n{name} ({len(html) / 1024:.0f} KB)")
+        baseline = None
+        for label, fn in contenders.items():
+            elapsed = time_it(fn, html, args.repeat)
+            baseline = baseline or elapsed
+            print(f"  {label:<26} {elapsed * 1000:8.1f} ms  ({baseline / elapsed:4.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,5 @@
+import argparse
+import tempfile
 import yaml
 import json
 import pandas as pd
@@ -6,10 +8,20 @@ import os
 from dotenv import load_dotenv
 
 from src.scraper import WebsiteScraper
+from src.site_crawler import SiteCrawler
 from src.keyword_research import SERPKeywordResearcher
+from src.client_pool import get_pool, rate_limiter, set_transport, shared
 from src.data_processor import KeywordDataProcessor
 from src.ad_group_builder import AdGroupBuilder
-from src.llm_helper import LLMHelper
+from src.keyword_frame import KeywordFrame
+from src.llm_cache import LLMCache
+from src.pipeline_dag import StageDAG
+from src.checkpoint import CheckpointStore
+from src.instrumentation import Instrumentation, use_instrumentation
+from src.llm_helper import MODEL as LLM_MODEL, LLMHelper
+from src.local_categorizer import LocalCategorizer
+from src.profiling import profile_call
+from src.replay import DEFAULT_FIXTURES_DIR, ReplayTransport
 
 load_dotenv()
 
@@ -37,33 +49,247 @@ class SEMKeywordPipeline:
                 raise ValueError("Either provide config_path or config_dict parameter")
         
         # Initialize components
-        self.scraper = WebsiteScraper()
-        self.keyword_researcher = SERPKeywordResearcher()
+        cache_dir = self.config.get('cache', {}).get('directory', './data/cache')
+        scraping = self.config.get('scraping', {})
+        self.scraper = WebsiteScraper(
+            cache_dir=os.path.join(cache_dir, 'http') if cache_dir else None,
+            stream=scraping.get('stream', False),
+            max_bytes=scraping.get('max_bytes', 2_000_000)
+        )
+        crawling = self.config.get('crawling', {})
+        self.crawler = SiteCrawler(
+            self.scraper,
+            max_pages_per_domain=crawling.get('max_pages_per_domain', 20),
+            time_budget=crawling.get('time_budget', 30.0)
+        )
+        serp_api = self.config.get('serp_api', {})
+        self.keyword_researcher = SERPKeywordResearcher(
+            requests_per_second=serp_api.get('requests_per_second', 5.0),
+            burst=serp_api.get('burst', 10),
+            cache_path=os.path.join(cache_dir, 'serp_cache.sqlite3') if cache_dir else None,
+            cache_ttls=serp_api.get('cache_ttl'),
+            min_concurrency=serp_api.get('min_concurrency', 1),
+            max_concurrency=serp_api.get('max_concurrency', 32),
+            target_latency=serp_api.get('target_latency', 5.0)
+        )
         self.data_processor = KeywordDataProcessor(self.config)
-        self.ad_group_builder = AdGroupBuilder(self.config)
-        self.llm_helper = LLMHelper()
+        llm = self.config.get('llm', {})
+        llm_cache_path = os.path.join(cache_dir, 'llm_cache.sqlite3') if cache_dir else None
+        llm_cache = shared(
+            ('llm_cache', os.path.abspath(llm_cache_path), llm.get('cache_ttl'), llm.get('cache_max_entries')),
+            lambda: LLMCache(
+                llm_cache_path,
+                ttl=llm.get('cache_ttl', 30 * 24 * 3600),
+                max_entries=llm.get('cache_max_entries', 50000)
+            )
+        ) if llm_cache_path else None
+        self.llm_helper = LLMHelper(
+            cache=llm_cache,
+            rate_limiter=rate_limiter('llm', llm.get('requests_per_second', 10), llm.get('burst'))
+        )
+        # Learned from the LLM's cached answers; confident keywords skip the LLM entirely.
+        # Trained once per process and cache, not on every pipeline construction; an
+        # untrained one isn't kept, so a later pipeline retries once the LLM has labelled more
+        min_similarity = llm.get('local_min_similarity', 0.35)
+        min_margin = llm.get('local_min_margin', 0.08)
+        local_categorizer = None
+        if llm_cache and llm.get('local_categorizer', True):
+            key = ('local_categorizer', os.path.abspath(llm_cache_path), LLM_MODEL, min_similarity, min_margin)
+            local_categorizer = shared(key, lambda: LocalCategorizer.from_llm_cache(
+                llm_cache, LLM_MODEL, min_similarity=min_similarity, min_margin=min_margin
+            ))
+            if not local_categorizer.is_trained:
+                get_pool().discard(key)
+        self.ad_group_builder = AdGroupBuilder(self.config, llm_helper=self.llm_helper,
+                                               local_categorizer=local_categorizer)
+        checkpoints = self.config.get('checkpoints', {})
+        checkpoint_dir = checkpoints.get(
+            'directory', os.path.join(cache_dir, 'checkpoints') if cache_dir else None
+        )
+        self.checkpoints = CheckpointStore(
+            checkpoint_dir, ttl=checkpoints.get('ttl', 24 * 3600)
+        ) if checkpoint_dir else None
+        if self.checkpoints:
+            self.checkpoints.evict()
+        
+        # Results of the last run, kept so rescore() can re-rank without network calls
+        self.scored_keywords = None
+        self.ad_groups = None
+        self.stage_timings = {}
+        self.instrumentation = None
+        self.run_profile = None
 
-    def run_pipeline(self):
-        """Execute the complete SEM keyword pipeline - returns data for direct download"""
+    def run_pipeline(self, resume: bool = False):
+        """Execute the complete SEM keyword pipeline - returns data for direct download
+        
+        Every stage output is checkpointed; with resume=True stages whose config
+        and inputs are unchanged are loaded instead of rerun.
+        """
         
         print("🚀 Starting AdSmart AI Pipeline...")
         
-        # Step 1: Scrape websites
-        print("\n📄 Step 1: Scraping websites...")
-        brand_content = self.scraper.scrape_website(self.config['brand']['website'])
-        competitor_content = self.scraper.scrape_website(self.config['competitor']['website'])
+        # Per run rather than process-wide, so concurrent pipelines don't mix their metrics
+        self.instrumentation = Instrumentation()
+        dag = self._build_dag(resume)
+        with use_instrumentation(self.instrumentation):
+            results = dag.run()
+        self.instrumentation.finish()
+        
+        # Profile exports cover every stage, so they are added once the DAG is done
+        download_files = self._add_profile(results['download_files'])
+        
+        print(f"\n✅ Pipeline completed! Generated {len(download_files)} files for download")
+        print(dag.report())
+        
+        self.stage_timings = dag.timings()
+        self.run_profile = self.instrumentation.to_dict()
+        # The ad group stage's copy of the keywords carries match types, CPCs and categories
+        self.scored_keywords, self.ad_groups = results['ad_groups']
+        return self.ad_groups, results['summary'], download_files
+    
+    def _add_profile(self, download_files: dict) -> dict:
+        """Append the last run's profile to the report and add its JSON and OpenMetrics exports"""
+        download_files['run_report.md'] += '\n' + self.instrumentation.summary_markdown()
+        download_files['run_profile.json'] = self.instrumentation.to_json()
+        download_files['run_metrics.prom'] = self.instrumentation.to_openmetrics()
+        return download_files
+    
+    def _build_dag(self, resume: bool = False) -> StageDAG:
+        """Pipeline steps as stages; each starts as soon as the stages it needs are done
+        
+        Each stage declares the config it reads, so a config change only reruns
+        the stages that read it and those downstream of them.
+        """
+        config = self.config
+        mode = config['keyword_settings']['mode']
+        dag = StageDAG(max_workers=4, checkpoints=self.checkpoints, resume=resume)
+        
+        # Step 1: Scrape websites (independent of each other)
+        scrape_config = {'mode': mode, 'scraping': config.get('scraping'), 'crawling': config.get('crawling')}
+        dag.add('scrape_brand', lambda: self._scrape(config['brand']['website']),
+                config={'url': config['brand']['website'], **scrape_config})
+        dag.add('scrape_competitor', lambda: self._scrape(config['competitor']['website']),
+                config={'url': config['competitor']['website'], **scrape_config})
         
         # Step 2: Generate seed keywords
-        print("\n🌱 Step 2: Generating seed keywords...")
-        if self.config['keyword_settings']['mode'] == 'minimal_content':
-            seed_keywords = self.llm_helper.generate_seed_keywords(brand_content, competitor_content)
+        if mode == 'minimal_content':
+            # The LLM prompt needs both sites
+            dag.add('seed_keywords', self._generate_seed_keywords, ['scrape_brand', 'scrape_competitor'],
+                    config={'model': LLM_MODEL})
         else:
-            # Extract from content directly
-            seed_keywords = (self.scraper.extract_products_services(brand_content) +
-                           self.scraper.extract_products_services(competitor_content))
+            # Extract from content directly, each site as soon as its crawl is done
+            dag.add('brand_seeds', self.scraper.extract_products_services, ['scrape_brand'])
+            dag.add('competitor_seeds', self.scraper.extract_products_services, ['scrape_competitor'])
+            dag.add('seed_keywords', self._merge_seed_keywords, ['brand_seeds', 'competitor_seeds'])
         
+        # Competitor keywords only need the competitor URL
+        dag.add('competitor_keywords', self._research_competitor_keywords,
+                config={'url': config['competitor']['website'], 'country': config['geo_targeting']['country']})
+        
+        # Steps 3-4: Research and process, then score separately so that new
+        # scoring weights resume from here
+        process_config = {
+            'mode': mode,
+            'min_search_volume': config['keyword_settings']['min_search_volume'],
+            'service_locations': config['service_locations'],
+            'country': config['geo_targeting']['country']
+        }
+        if config['keyword_settings'].get('streaming', False):
+            dag.add('processed_keywords', self._research_and_process_streaming,
+                    ['seed_keywords', 'competitor_keywords'], config=process_config)
+        else:
+            dag.add('processed_keywords', self._research_and_process,
+                    ['seed_keywords', 'competitor_keywords'], config=process_config)
+        dag.add('scored_keywords', self._score_keywords, ['processed_keywords'], config={'scoring': config['scoring']})
+        
+        # Step 5: Build ad groups and summary
+        # The local categorizer decides which keywords reach the LLM, so its thresholds count
+        llm = config.get('llm', {})
+        dag.add('ad_groups', self._build_ad_groups, ['scored_keywords'],
+                config={'conversion_rate': config['keyword_settings']['conversion_rate'], 'model': LLM_MODEL,
+                        'local_categorizer': llm.get('local_categorizer', True),
+                        'local_min_similarity': llm.get('local_min_similarity', 0.35),
+                        'local_min_margin': llm.get('local_min_margin', 0.08)})
+        dag.add('summary', self._summarize, ['ad_groups'])
+        
+        # Step 6: Generate download files (in-memory)
+        dag.add('download_files', self._generate_download_files, ['ad_groups', 'summary'],
+                config={'mode': mode, 'min_search_volume': config['keyword_settings']['min_search_volume']})
+        return dag
+    
+    def _scrape(self, url: str):
+        print(f"\n📄 Step 1: Scraping {url}...")
+        if self.config['keyword_settings']['mode'] == 'rich_content':
+            # Seeds come from the whole catalogue, so crawl beyond the homepage
+            return self.crawler.crawl(url)
+        return self.scraper.scrape_website(url)
+    
+    def _generate_seed_keywords(self, brand_content, competitor_content):
+        print("\n🌱 Step 2: Generating seed keywords...")
+        seed_keywords = self.llm_helper.generate_seed_keywords(brand_content, competitor_content)
         print(f"Generated {len(seed_keywords)} seed keywords")
+        return seed_keywords
+    
+    def _merge_seed_keywords(self, brand_seeds, competitor_seeds):
+        seed_keywords = brand_seeds + competitor_seeds
+        print(f"\n🌱 Step 2: Generated {len(seed_keywords)} seed keywords")
+        return seed_keywords
+    
+    def _research_competitor_keywords(self):
+        """Metrics for keywords found on the competitor's site"""
+        competitor_keywords = self.keyword_researcher.get_competitor_keywords(
+            self.config['competitor']['website']
+        )
+        if not competitor_keywords:
+            return []
+        return self.keyword_researcher._get_keyword_metrics(
+            competitor_keywords[:20],  # Limit for API costs
+            self.config['geo_targeting']['country']
+        )
+    
+    def _score_keywords(self, location_keywords):
+        return self.data_processor.score_keywords(location_keywords)
+    
+    def _build_ad_groups(self, scored_keywords):
+        """(annotated keywords, ad groups); scored_keywords itself is not modified, so its
+        checkpoint stays valid"""
+        print("\n📊 Step 5: Building ad groups...")
+        return self.ad_group_builder.annotate_and_group(scored_keywords)
+    
+    def _summarize(self, grouped):
+        _, ad_groups = grouped
+        return self.ad_group_builder.generate_ad_group_summary(ad_groups)
+    
+    def _generate_download_files(self, grouped, summary):
+        print("\n💾 Step 6: Preparing download files...")
+        keywords, ad_groups = grouped
+        return self.data_processor.generate_download_files(ad_groups, summary, keywords)
+    
+    def rescore(self, scoring_weights: dict):
+        """Re-rank the last run with new scoring weights - no scraping, SERP or LLM calls"""
+        if self.scored_keywords is None:
+            raise ValueError("run_pipeline() must be called before rescore()")
+        
+        self.config['scoring'] = dict(scoring_weights)
+        scored_keywords = self.data_processor.rescore_keywords(self.scored_keywords, self.config['scoring'])
+        # Ad groups keep their order; only their scores change
+        ad_groups = {
+            name: self.data_processor.rescore_keywords(keywords, self.config['scoring'], sort=False)
+            for name, keywords in self.ad_groups.items()
+        }
         
+        summary = self.ad_group_builder.generate_ad_group_summary(ad_groups)
+        # Rescoring makes no external calls, so the run's profile still describes these results
+        download_files = self._add_profile(
+            self.data_processor.generate_download_files(ad_groups, summary, scored_keywords)
+        )
+        
+        self.scored_keywords = scored_keywords
+        self.ad_groups = ad_groups
+        return ad_groups, summary, download_files
+
+    def _research_and_process(self, seed_keywords, competitor_keyword_data):
+        """Steps 3-4: collect every SERP result, then process the full list"""
         # Step 3: Research keywords using SERP API
         print("\n🔍 Step 3: Researching keywords with SERP API...")
         raw_keywords = self.keyword_researcher.get_keyword_ideas(
@@ -72,15 +298,7 @@ class SEMKeywordPipeline:
         )
         
         # Add competitor keywords
-        competitor_keywords = self.keyword_researcher.get_competitor_keywords(
-            self.config['competitor']['website']
-        )
-        if competitor_keywords:
-            competitor_keyword_data = self.keyword_researcher._get_keyword_metrics(
-                competitor_keywords[:20],  # Limit for API costs
-                self.config['geo_targeting']['country']
-            )
-            raw_keywords.extend(competitor_keyword_data)
+        raw_keywords.extend(competitor_keyword_data)
         
         print(f"Found {len(raw_keywords)} raw keywords")
         
@@ -93,34 +311,102 @@ class SEMKeywordPipeline:
         # Filter by search volume
         filtered_keywords = self.data_processor.filter_keywords(unique_keywords)
         
-        # Add location variants
-        location_keywords = self.data_processor.add_location_variants(
+        # Add location variants (scored in their own stage)
+        return self.data_processor.add_location_variants(
             filtered_keywords, 
             self.config['service_locations']
         )
+    
+    def _research_and_process_streaming(self, seed_keywords, competitor_keyword_data):
+        """Steps 3-4 overlapped: records flow through dedup and filter as SERP
+        lookups complete; only location variants (and scoring) wait for all of them"""
+        print("\n🔍 Step 3+4: Researching and processing keywords as results arrive...")
         
-        # Score keywords
-        scored_keywords = self.data_processor.score_keywords(location_keywords)
-        
-        # Step 5: Build ad groups
-        print("\n📊 Step 5: Building ad groups...")
-        ad_groups = self.ad_group_builder.build_ad_groups(scored_keywords)
-        
-        # Generate summary
-        summary = self.ad_group_builder.generate_ad_group_summary(ad_groups)
-        
-        # Step 6: Generate download files (in-memory)
-        print("\n💾 Step 6: Preparing download files...")
-        download_files = self.data_processor.generate_download_files(ad_groups, summary, scored_keywords)
+        unique_keywords = self.data_processor.iter_deduplicated(
+            self._iter_raw_keywords(seed_keywords, competitor_keyword_data)
+        )
+        filtered_keywords = self.data_processor.iter_filtered(unique_keywords)
         
-        print(f"\n✅ Pipeline completed! Generated {len(download_files)} files for download")
+        # Variants are lazy triples over the filtered frame, so they are added at the
+        # barrier; scoring needs global min/max and runs in the next stage. Records arrive
+        # in completion order, so sort them: score ties and the checkpoint must not
+        # depend on response timing
+        return self.data_processor.add_location_variants(
+            KeywordFrame.from_records(sorted(filtered_keywords, key=lambda kw: kw['keyword'])),
+            self.config['service_locations']
+        )
+    
+    def _iter_raw_keywords(self, seed_keywords, competitor_keyword_data):
+        """Keyword records from SERP research, yielded as each lookup completes"""
+        country = self.config['geo_targeting']['country']
+        yield from self.keyword_researcher.iter_keyword_ideas(seed_keywords, country)
         
-        return ad_groups, summary, download_files
+        # Researched concurrently in its own stage
+        yield from competitor_keyword_data
+
+
+def isolated_cache_config(config: dict, prefix: str = 'adsmart-') -> dict:
+    """Config whose SERP, LLM and HTTP caches and checkpoints live in a fresh temp
+    directory, so fixture-driven runs neither read nor pollute the real caches"""
+    config = dict(config)
+    config['cache'] = {**config.get('cache', {}), 'directory': tempfile.mkdtemp(prefix=prefix)}
+    config['checkpoints'] = {'directory': os.path.join(config['cache']['directory'], 'checkpoints')}
+    return config
+
+
+def profile_config(config: dict) -> dict:
+    """Config for a reproducible profiling run: empty caches and no rate limits,
+    so every stage does its full work and nothing waits on a quota"""
+    config = isolated_cache_config(config, prefix='adsmart-profile-')
+    config['serp_api'] = {**config.get('serp_api', {}), 'requests_per_second': 1000, 'burst': 1000}
+    config['llm'] = {**config.get('llm', {}), 'requests_per_second': 1000}
+    return config
+
 
 if __name__ == "__main__":
     # CLI usage example
-    pipeline = SEMKeywordPipeline(config_path='config.yaml')
-    ad_groups, summary, download_files = pipeline.run_pipeline()
+    parser = argparse.ArgumentParser(description="AdSmart AI SEM keyword pipeline")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--resume', action='store_true',
+                        help="Reuse checkpointed stages whose config and inputs are unchanged")
+    parser.add_argument('--replay', action='store_true',
+                        help="Serve SerpAPI, OpenAI and page requests from replay fixtures (no network)")
+    parser.add_argument('--record-fixtures', action='store_true',
+                        help="Save every SerpAPI, OpenAI and page response as a replay fixture")
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES_DIR, help="Replay fixtures directory")
+    parser.add_argument('--profile', nargs='?', const='sampling', choices=['sampling', 'cprofile'],
+                        help="Profile a replayed run (default: sampling profiler with collapsed stacks)")
+    parser.add_argument('--profile-output', default='./data/profile')
+    parser.add_argument('--profile-top', type=int, default=25, help="Rows in the hot function table")
+    args = parser.parse_args()
+    
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    
+    if args.profile or args.replay:
+        # Keys are only checked for presence; nothing leaves the machine
+        set_transport(ReplayTransport(args.fixtures))
+        os.environ.setdefault('SERP_API_KEY', 'replay')
+        os.environ.setdefault('OPENAI_API_KEY', 'replay')
+        if args.replay:
+            # Synthetic responses must never reach the caches live runs read from
+            config = isolated_cache_config(config, prefix='adsmart-replay-')
+    elif args.record_fixtures:
+        set_transport(ReplayTransport(args.fixtures, record=True))
+        # Warm caches would answer before the transport, leaving nothing to record
+        config = isolated_cache_config(config, prefix='adsmart-record-')
+    
+    if args.profile:
+        pipeline = SEMKeywordPipeline(config_dict=profile_config(config))
+        (ad_groups, summary, download_files), profile_files = profile_call(
+            pipeline.run_pipeline, args.profile_output, mode=args.profile, top=args.profile_top
+        )
+        print("\n🔬 Profile written:")
+        for path in profile_files.values():
+            print(f"  - {path}")
+    else:
+        pipeline = SEMKeywordPipeline(config_dict=config)
+        ad_groups, summary, download_files = pipeline.run_pipeline(resume=args.resume)
     
     # For CLI usage, you can still save files if needed
     print("\n📁 Available download files:")
@@ -1,87 +1,146 @@
-from typing import Dict, List
-from src.llm_helper import LLMHelper
+from typing import Dict, List, Tuple, Union
+import numpy as np
+from src.instrumentation import get_instrumentation
+from src.keyword_frame import KeywordFrame, category_code, competition_code, round_values
+from src.llm_helper import LEFTOVER_CATEGORY, LLMHelper
+from src.local_categorizer import LocalCategorizer
 
 class AdGroupBuilder:
-    def __init__(self, config: Dict):
+    def __init__(self, config: Dict, llm_helper: LLMHelper = None, local_categorizer: LocalCategorizer = None):
         self.config = config
-        self.llm_helper = LLMHelper()
+        self.llm_helper = llm_helper or LLMHelper()
+        self.local_categorizer = local_categorizer
         self.conversion_rate = config['keyword_settings']['conversion_rate']
     
-    def build_ad_groups(self, keywords: List[Dict]) -> Dict[str, List[Dict]]:
+    def build_ad_groups(self, keywords: Union[KeywordFrame, List[Dict]]) -> Dict[str, KeywordFrame]:
         """Build ad groups from categorized keywords"""
+        return self.annotate_and_group(keywords)[1]
+    
+    def annotate_and_group(self, keywords: Union[KeywordFrame, List[Dict]]) -> Tuple[KeywordFrame, Dict[str, KeywordFrame]]:
+        """(copy of keywords carrying the ad group fields, ad groups); the input is left untouched"""
+        frame = KeywordFrame.coerce(keywords).copy()
         
-        # Use LLM to categorize keywords
-        categorized = self.llm_helper.categorize_keywords(keywords)
+        # Use LLM to categorize keywords; '_row' maps its answers back to frame rows
+        rules = frame.rule_masks()
+        stubs = [{'keyword': keyword, '_row': i, '_rules': int(rules[i])} for i, keyword in enumerate(frame['keyword'])]
+        categorized = {}
+        for category, kw_list in self._categorize(stubs).items():
+            # Names the LLM made up have no category code; group them with the leftovers
+            if category_code(category) < 0:
+                print(f"Unknown category {category!r} from the LLM, {len(kw_list)} keywords moved to {LEFTOVER_CATEGORY}")
+                category = LEFTOVER_CATEGORY
+            categorized.setdefault(category, []).extend(kw_list)
         
-        # Add match types and CPC recommendations to each keyword
+        # Add match types and CPC recommendations to each group
+        ad_groups = {}
         for category, kw_list in categorized.items():
-            for kw in kw_list:
-                kw['match_types'] = self._get_match_types(kw, category)
-                kw['suggested_cpc_start'] = self._calculate_suggested_cpc(kw, 'start')
-                kw['suggested_cpc_ceiling'] = self._calculate_suggested_cpc(kw, 'ceiling')
-                kw['category'] = category
+            rows = np.array([kw['_row'] for kw in kw_list], dtype=np.int64)
+            group = frame.take(rows)
+            group.set_column('match_types', self._get_match_types(group, category))
+            group.set_column('suggested_cpc_start', self._calculate_suggested_cpc(group, 'start'))
+            group.set_column('suggested_cpc_ceiling', self._calculate_suggested_cpc(group, 'ceiling'))
+            group.set_column('category', category_code(category))
+            
+            # Mirror onto the master frame so its export carries the ad group fields too
+            frame.update_rows(rows, group, ('match_types', 'suggested_cpc_start', 'suggested_cpc_ceiling', 'category'))
+            ad_groups[category] = group
+        
+        # Location variants all carry a city, so they go to location_terms without an LLM round trip
+        variants = frame.variants
+        if variants is not None and len(variants):
+            variants.set_column('match_types', self._get_match_types(variants, 'location_terms'))
+            variants.set_column('suggested_cpc_start', self._calculate_suggested_cpc(variants, 'start'))
+            variants.set_column('suggested_cpc_ceiling', self._calculate_suggested_cpc(variants, 'ceiling'))
+            variants.set_column('category', category_code('location_terms'))
+            
+            group = ad_groups.get('location_terms')
+            if group is None:
+                group = frame.take([])
+            group.variants = variants
+            ad_groups['location_terms'] = group
+        
+        return frame, ad_groups
+    
+    def _categorize(self, stubs: List[Dict]) -> Dict[str, List[Dict]]:
+        """The LLM's cached per-keyword answers first, then the local categorizer;
+        only keywords neither can place go to the LLM"""
+        if self.local_categorizer is None or not self.local_categorizer.is_trained:
+            return self.llm_helper.categorize_keywords(stubs)
+        
+        categorized, misses = self.llm_helper.cached_categories(stubs)
+        if not misses:
+            return categorized
         
+        local, uncertain = self.local_categorizer.categorize(misses)
+        print(f"Local categorizer placed {len(misses) - len(uncertain)} keywords, {len(uncertain)} left for the LLM")
+        get_instrumentation().count('local_categorizer.keywords', len(misses) - len(uncertain))
+        for category, kw_list in local.items():
+            categorized.setdefault(category, []).extend(kw_list)
+        if uncertain:
+            for category, kw_list in self.llm_helper.categorize_keywords(uncertain, check_cache=False).items():
+                categorized.setdefault(category, []).extend(kw_list)
         return categorized
     
-    def _get_match_types(self, keyword: Dict, category: str) -> List[str]:
-        """Determine appropriate match types for keyword based on category"""
+    def _get_match_types(self, keywords, category: str) -> List[tuple]:
+        """Determine appropriate match types for each keyword based on category"""
         
         match_type_rules = {
-            'brand_terms': ['Exact', 'Phrase'],
-            'category_terms': ['Phrase', 'Exact'],
-            'competitor_terms': ['Exact'],
-            'location_terms': ['Phrase', 'Exact'],
-            'informational_terms': ['Phrase']
+            'brand_terms': ('Exact', 'Phrase'),
+            'category_terms': ('Phrase', 'Exact'),
+            'competitor_terms': ('Exact',),
+            'location_terms': ('Phrase', 'Exact'),
+            'informational_terms': ('Phrase',)
         }
         
-        base_match_types = match_type_rules.get(category, ['Phrase'])
+        base_match_types = match_type_rules.get(category, ('Phrase',))
+        if category not in ['category_terms', 'informational_terms']:
+            return [base_match_types] * len(keywords)
         
         # Add Broad match for high-volume, low-competition keywords
-        if (keyword['avg_monthly_searches'] > 2000 and 
-            keyword['competition'] == 'LOW' and 
-            category in ['category_terms', 'informational_terms']):
-            base_match_types.append('Broad')
-        
-        return base_match_types
+        with_broad = base_match_types + ('Broad',)
+        broad = (keywords['avg_monthly_searches'] > 2000) & (keywords['competition'] == competition_code('LOW'))
+        return [with_broad if is_broad else base_match_types for is_broad in broad]
     
-    def _calculate_suggested_cpc(self, keyword: Dict, cpc_type: str) -> float:
+    def _calculate_suggested_cpc(self, keywords, cpc_type: str) -> np.ndarray:
         """Calculate suggested CPC based on bid benchmarks"""
         
-        low_bid = keyword['top_of_page_bid_low']
-        high_bid = keyword['top_of_page_bid_high']
+        low_bid = keywords['top_of_page_bid_low'].astype(np.float64)
+        high_bid = keywords['top_of_page_bid_high'].astype(np.float64)
         
         if cpc_type == 'start':
             # Start at 70-80% of low bid or mid-point
-            suggested = min(low_bid * 0.75, (low_bid + high_bid) / 2)
+            suggested = np.minimum(low_bid * 0.75, (low_bid + high_bid) / 2)
         else:  # ceiling
             # Ceiling at high bid
             suggested = high_bid
         
         # Adjust based on conversion rate and competition
-        if keyword['competition'] == 'LOW':
-            suggested *= 0.9
-        elif keyword['competition'] == 'HIGH':
-            suggested *= 1.1
+        competition = keywords['competition']
+        suggested = np.where(competition == competition_code('LOW'), suggested * 0.9, suggested)
+        suggested = np.where(competition == competition_code('HIGH'), suggested * 1.1, suggested)
         
-        return round(suggested, 2)
+        return round_values(suggested, 2)
     
-    def generate_ad_group_summary(self, ad_groups: Dict[str, List[Dict]]) -> Dict:
+    def generate_ad_group_summary(self, ad_groups: Dict[str, KeywordFrame]) -> Dict:
         """Generate summary statistics for ad groups"""
+        ad_groups = {name: KeywordFrame.coerce(keywords) for name, keywords in ad_groups.items()}
         
         summary = {
-            'total_keywords': sum(len(keywords) for keywords in ad_groups.values()),
+            'total_keywords': sum(keywords.total_count for keywords in ad_groups.values()),
             'total_ad_groups': len(ad_groups),
             'ad_group_details': {}
         }
         
         for group_name, keywords in ad_groups.items():
-            if keywords:
+            if keywords.total_count:
+                # Lazy location variants count too; only the top keyword strings get built
+                top_rows = np.argsort(-keywords.full_column('score'), kind='stable')[:5]
                 summary['ad_group_details'][group_name] = {
-                    'keyword_count': len(keywords),
-                    'avg_search_volume': round(sum(kw['avg_monthly_searches'] for kw in keywords) / len(keywords)),
-                    'avg_score': round(sum(kw['score'] for kw in keywords) / len(keywords), 3),
-                    'avg_cpc_start': round(sum(kw['suggested_cpc_start'] for kw in keywords) / len(keywords), 2),
-                    'top_keywords': [kw['keyword'] for kw in sorted(keywords, key=lambda x: x['score'], reverse=True)[:5]]
+                    'keyword_count': keywords.total_count,
+                    'avg_search_volume': round(float(keywords.full_column('avg_monthly_searches').mean())),
+                    'avg_score': round(float(keywords.full_column('score').mean()), 3),
+                    'avg_cpc_start': round(float(keywords.full_column('suggested_cpc_start').mean()), 2),
+                    'top_keywords': [keywords.keyword_at(i) for i in top_rows]
                 }
         
         return summary
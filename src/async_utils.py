@@ -0,0 +1,104 @@
+import asyncio
+import contextvars
+import functools
+import queue
+import threading
+from typing import Awaitable, Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar('T')
+
+
+class _BackgroundLoop:
+    """Process-wide event loop running in a daemon thread.
+
+    Sync callers (the CLI, Streamlit reruns, worker threads) submit coroutines
+    here instead of calling asyncio.run(), so async clients and their
+    connection pools stay bound to a single loop for the life of the process.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name='adsmart-event-loop',
+                    daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    def in_loop_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+
+_background = _BackgroundLoop()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared background event loop, starting it if needed"""
+    return _background.get_loop()
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """Run a coroutine on the shared loop and block until it finishes"""
+    if _background.in_loop_thread():
+        raise RuntimeError("run_sync() cannot be called from the shared event loop; await the coroutine instead")
+    future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    return future.result()
+
+
+async def off_loop(fn: Callable[..., T], *args) -> T:
+    """Run blocking work (parsing, SQLite, file IO) in the default thread pool so the
+    shared loop keeps serving other requests; the context is copied so per-run
+    instrumentation still records it"""
+    call = functools.partial(contextvars.copy_context().run, fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(None, call)
+
+
+_DONE = object()
+
+
+def iter_as_completed(coros: Iterable[Awaitable[T]]) -> Iterator[T]:
+    """Run coroutines concurrently on the shared loop, yielding each result as it finishes.
+
+    Closing the iterator early cancels whatever is still running.
+    """
+    # Checked here rather than on first next(): blocking on the queue from the loop
+    # thread would deadlock, since the loop could never run the coroutines
+    if _background.in_loop_thread():
+        raise RuntimeError("iter_as_completed() cannot be called from the shared event loop; "
+                           "use asyncio.as_completed instead")
+    return _iter_as_completed(coros)
+
+
+def _iter_as_completed(coros: Iterable[Awaitable[T]]) -> Iterator[T]:
+    results = queue.Queue()
+
+    async def produce():
+        try:
+            tasks = [asyncio.ensure_future(coro) for coro in coros]
+            try:
+                for task in asyncio.as_completed(tasks):
+                    results.put(await task)
+            finally:
+                for task in tasks:
+                    task.cancel()
+        finally:
+            results.put(_DONE)
+
+    future = asyncio.run_coroutine_threadsafe(produce(), get_loop())
+    try:
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            yield item
+        future.result()
+    finally:
+        future.cancel()
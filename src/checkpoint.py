@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+# Bump when a stage's output format changes so old checkpoints are ignored
+CHECKPOINT_VERSION = 1
+
+
+def digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class CheckpointStore:
+    """Content-addressed pickles of pipeline stage outputs.
+
+    A stage's key hashes its name, its slice of the config and the digests of
+    its inputs' pickled bytes, so any upstream change (or an identical rerun
+    producing the same bytes) flows through to the keys downstream.
+
+    Checkpoints older than ttl seconds are not loaded, so resumed network
+    stages (scrapes, SERP lookups) still pick up changes on the live sites;
+    evict() deletes them.
+    """
+
+    def __init__(self, directory: str, ttl: Optional[float] = 24 * 3600):
+        self.root = Path(directory)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0}
+
+    def _expired(self, path: Path, now: float) -> bool:
+        return self.ttl is not None and now - path.stat().st_mtime > self.ttl
+
+    def key(self, stage: str, config: Optional[Dict], input_digests: Sequence[str]) -> str:
+        payload = json.dumps(
+            [CHECKPOINT_VERSION, stage, config, list(input_digests)], sort_keys=True, default=str
+        )
+        return digest(payload.encode('utf-8'))
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.pkl"
+
+    def load(self, key: str) -> Optional[Tuple[Any, str]]:
+        """(value, digest of its bytes), or None if there is no usable checkpoint"""
+        path = self._path(key)
+        try:
+            if self._expired(path, time.time()):
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+            data = path.read_bytes()
+            value = pickle.loads(data)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        return value, digest(data)
+
+    def save(self, key: str, value: Any) -> str:
+        """Store a stage output and return the digest of its bytes"""
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return digest(data)
+
+    def evict(self) -> int:
+        """Delete expired checkpoints and stale temp files; returns how many were removed"""
+        if self.ttl is None:
+            return 0
+        now = time.time()
+        removed = 0
+        for path in list(self.root.glob('*.pkl')) + list(self.root.glob('*.tmp')):
+            try:
+                if self._expired(path, now):
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                continue  # Removed by another process
+        return removed
@@ -0,0 +1,94 @@
+import os
+import threading
+from typing import Callable, Dict, Hashable, TypeVar
+
+T = TypeVar('T')
+
+
+class ClientPool:
+    """Process-wide registry of API clients, connection pools and caches.
+
+    Components ask for a client by key instead of constructing one, so every
+    pipeline built in the process (CLI runs, Streamlit reruns, batch workers'
+    threads) reuses the same keep-alive connections, rate limiters and SQLite
+    handles.
+    """
+
+    def __init__(self):
+        self._clients = {}
+        self._lock = threading.RLock()  # Factories may themselves ask the pool for clients
+        self.created = 0
+        self.reused = 0
+
+    def get(self, key: Hashable, factory: Callable[[], T]) -> T:
+        with self._lock:
+            if key in self._clients:
+                self.reused += 1
+                return self._clients[key]
+            client = factory()
+            self._clients[key] = client
+            self.created += 1
+            return client
+
+    def discard(self, key: Hashable) -> None:
+        """Forget one client so the next get() builds it again"""
+        with self._lock:
+            self._clients.pop(key, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'clients': len(self._clients), 'created': self.created, 'reused': self.reused}
+
+    def clear(self) -> None:
+        """Forget every client (they are not closed; in-flight users keep theirs)"""
+        with self._lock:
+            self._clients = {}
+
+
+_pool = ClientPool()
+_transport = None
+
+
+def get_pool() -> ClientPool:
+    return _pool
+
+
+def set_transport(transport) -> None:
+    """Route every shared HTTP client (scraper, SerpAPI, OpenAI) through an httpx
+    transport, e.g. replay fixtures; None restores the network. Clients built
+    before the switch are forgotten so they are rebuilt with it."""
+    global _transport
+    _transport = transport
+    _pool.clear()
+
+
+def http_transport():
+    """The transport set with set_transport(), or None for httpx's default"""
+    return _transport
+
+
+def shared(key: Hashable, factory: Callable[[], T]) -> T:
+    """The process-wide client for key, built with factory the first time"""
+    return _pool.get(key, factory)
+
+
+def openai_client(api_key: str = None):
+    """Shared OpenAI client (and its HTTP connection pool) per key and base URL"""
+    from openai import OpenAI
+
+    api_key = api_key or os.getenv('OPENAI_API_KEY')
+    base_url = os.getenv('OPENAI_BASE_URL')
+    if _transport is not None:
+        import httpx
+
+        return shared(('openai', api_key, base_url),
+                      lambda: OpenAI(api_key=api_key, http_client=httpx.Client(transport=_transport)))
+    return shared(('openai', api_key, base_url), lambda: OpenAI(api_key=api_key))
+
+
+def rate_limiter(api: str, rate: float, burst: int = None):
+    """Process-wide token bucket for an API quota; the first caller's limits win,
+    so a batch worker can pre-register one that is shared across the pool"""
+    from src.serp_client import TokenBucket
+
+    return shared(('rate_limiter', api), lambda: TokenBucket(rate, burst))
@@ -1,136 +1,146 @@
-import pandas as pd
-from typing import List, Dict
+from typing import Iterable, Iterator, List, Dict, Union
 import numpy as np
 import json
 
+from src.keyword_frame import KeywordFrame
+from src.keyword_scoring import KeywordScorer
+from src.keyword_rules import RULES, location_matcher, rule_mask
+from src.location_variants import LocationVariants
+
+Keywords = Union[KeywordFrame, List[Dict]]
+
 class KeywordDataProcessor:
     def __init__(self, config: Dict):
         self.config = config
         self.min_volume = config['keyword_settings']['min_search_volume']
         self.scoring_weights = config['scoring']
+        self.scorer = None
     
-    def deduplicate_keywords(self, keywords: List[Dict]) -> List[Dict]:
+    def deduplicate_keywords(self, keywords: Keywords) -> KeywordFrame:
         """Remove duplicate keywords"""
+        frame = KeywordFrame.coerce(keywords)
+        seen = set()
+        keep = []
+        
+        for i, keyword in enumerate(frame['keyword']):
+            keyword_normalized = keyword.lower().strip()
+            if keyword_normalized not in seen:
+                seen.add(keyword_normalized)
+                keep.append(i)
+        
+        print(f"Deduplicated keywords: {len(frame)} -> {len(keep)}")
+        return frame.take(keep)
+    
+    def iter_deduplicated(self, keywords: Iterable[Dict]) -> Iterator[Dict]:
+        """Streaming deduplication - yields each keyword the first time it is seen"""
         seen = set()
-        unique_keywords = []
+        total = 0
         
         for kw in keywords:
+            total += 1
             keyword_normalized = kw['keyword'].lower().strip()
             if keyword_normalized not in seen:
                 seen.add(keyword_normalized)
-                unique_keywords.append(kw)
+                yield kw
         
-        print(f"Deduplicated keywords: {len(keywords)} -> {len(unique_keywords)}")
-        return unique_keywords
+        print(f"Deduplicated keywords: {total} -> {len(seen)}")
     
-    def filter_keywords(self, keywords: List[Dict]) -> List[Dict]:
+    def filter_keywords(self, keywords: Keywords) -> KeywordFrame:
         """Filter keywords based on minimum search volume"""
-        filtered = []
+        frame = KeywordFrame.coerce(keywords)
+        filtered = frame.filter(frame['avg_monthly_searches'] >= self.min_volume)
+        
+        print(f"Filtered keywords: {len(frame)} -> {len(filtered)} (min volume: {self.min_volume})")
+        return filtered
+    
+    def iter_filtered(self, keywords: Iterable[Dict]) -> Iterator[Dict]:
+        """Streaming volume filter"""
+        total = 0
+        kept = 0
         for kw in keywords:
+            total += 1
             if kw['avg_monthly_searches'] >= self.min_volume:
-                filtered.append(kw)
+                kept += 1
+                yield kw
         
-        print(f"Filtered keywords: {len(keywords)} -> {len(filtered)} (min volume: {self.min_volume})")
-        return filtered
+        print(f"Filtered keywords: {total} -> {kept} (min volume: {self.min_volume})")
     
-    def score_keywords(self, keywords: List[Dict]) -> List[Dict]:
+    def score_keywords(self, keywords: Keywords) -> KeywordFrame:
         """Score keywords based on search volume, competition, and CPC"""
-        if not keywords:
-            return keywords
-        
-        # Extract metrics for normalization
-        volumes = [kw['avg_monthly_searches'] for kw in keywords]
-        competitions = [kw['competition_score'] for kw in keywords]
-        cpcs = [kw['top_of_page_bid_high'] for kw in keywords]
+        # Scores are written into the frame, so work on a copy of the (checkpointed) input
+        frame = KeywordFrame.coerce(keywords).copy()
+        if not frame.total_count:
+            return frame
         
-        # Normalize metrics (0-1 scale)
-        volume_min, volume_max = min(volumes), max(volumes)
-        cpc_min, cpc_max = min(cpcs), max(cpcs)
-        
-        for kw in keywords:
-            # Normalize search volume (higher is better)
-            volume_norm = (kw['avg_monthly_searches'] - volume_min) / (volume_max - volume_min) if volume_max > volume_min else 0.5
-            
-            # Normalize CPC (lower is better for scoring)
-            cpc_norm = 1 - ((kw['top_of_page_bid_high'] - cpc_min) / (cpc_max - cpc_min)) if cpc_max > cpc_min else 0.5
-            
-            # Competition score (lower is better)
-            comp_norm = 1 - kw['competition_score']
-            
-            # Calculate weighted score
-            score = (
-                self.scoring_weights['search_volume_weight'] * volume_norm +
-                self.scoring_weights['cpc_weight'] * cpc_norm +
-                self.scoring_weights['competition_weight'] * comp_norm
-            )
-            
-            kw['score'] = round(score, 3)
+        # Keep the scorer so new weights can re-rank without rerunning the pipeline
+        self.scorer = KeywordScorer(frame)
         
         # Sort by score (highest first)
-        keywords.sort(key=lambda x: x['score'], reverse=True)
-        
-        return keywords
+        return self.scorer.rank(self.scoring_weights)
     
-    def add_location_variants(self, keywords: List[Dict], locations: List[str]) -> List[Dict]:
-        """Add location-based variants for relevant keywords"""
-        location_keywords = []
-        
-        for kw in keywords:
-            keyword = kw['keyword']
-            
-            # Skip if already location-specific
-            if any(loc.split(',')[0].lower() in keyword.lower() for loc in locations):
-                continue
-            
-            # Add location variants for relevant keywords
-            if self._is_location_relevant(keyword):
-                for location in locations:
-                    city = location.split(',')[0]  # Extract city name
-                    
-                    # Create location variants
-                    variants = [
-                        f"{keyword} {city}",
-                        f"{keyword} in {city}",
-                        f"{city} {keyword}"
-                    ]
-                    
-                    for variant in variants:
-                        location_kw = kw.copy()
-                        location_kw['keyword'] = variant
-                        location_kw['avg_monthly_searches'] = int(kw['avg_monthly_searches'] * 0.1)  # Estimate lower volume
-                        location_kw['is_location_variant'] = True
-                        location_keywords.append(location_kw)
-        
-        return keywords + location_keywords
+    def rescore_keywords(self, keywords: KeywordFrame, scoring_weights: Dict, sort: bool = True) -> KeywordFrame:
+        """Rescore already scored keywords with new weights, reusing cached components"""
+        self.scoring_weights = scoring_weights
+        if self.scorer is None:
+            # e.g. scores loaded from a checkpoint rather than computed in this process
+            self.scorer = KeywordScorer(KeywordFrame.coerce(keywords))
+        if not sort:
+            return self.scorer.rescore(scoring_weights, keywords)
+        return self.scorer.rank(scoring_weights, keywords)
     
-    def _is_location_relevant(self, keyword: str) -> bool:
+    def add_location_variants(self, keywords: Keywords, locations: List[str]) -> KeywordFrame:
+        """Add location-based variants for relevant keywords.
+        
+        Variants are attached lazily as frame.variants and only become rows on export.
+        """
+        frame = KeywordFrame.coerce(keywords)
+        cities = [location.split(',')[0] for location in locations]  # Extract city name
+        rules = frame.rule_masks()
+        rows = [i for i, keyword in enumerate(frame['keyword'])
+                if self._wants_location_variants(keyword, cities, int(rules[i]))]
+        
+        frame = frame.take(np.arange(len(frame)))
+        frame.variants = LocationVariants.expand(frame, cities, rows)
+        print(f"Added {len(frame.variants)} location variants for {len(rows)} keywords")
+        return frame
+    
+    def _wants_location_variants(self, keyword: str, cities: List[str], rules: int = None) -> bool:
+        """Whether a keyword gets location variants"""
+        # Add location variants for relevant keywords
+        if not self._is_location_relevant(keyword, rules):
+            return False
+        
+        # Skip if already location-specific
+        return not location_matcher(tuple(city.lower() for city in cities)).mask(keyword)
+    
+    def _is_location_relevant(self, keyword: str, rules: int = None) -> bool:
         """Check if keyword is relevant for location variants"""
-        location_relevant_terms = [
-            'service', 'repair', 'store', 'shop', 'clinic', 'doctor', 'dentist',
-            'restaurant', 'delivery', 'installation', 'contractor', 'lawyer',
-            'real estate', 'plumber', 'electrician', 'near me', 'local'
-        ]
-        
-        return any(term in keyword.lower() for term in location_relevant_terms)
+        rules = rule_mask(keyword) if rules is None else rules
+        return RULES.has(rules, 'location_relevant')
     
-    def generate_download_files(self, ad_groups: Dict, summary: Dict, scored_keywords: List[Dict]) -> Dict:
+    def generate_download_files(self, ad_groups: Dict[str, Keywords], summary: Dict, scored_keywords: Keywords) -> Dict:
         """Generate all files as in-memory objects for download"""
         files = {}
+        # Location variants are only expanded into rows here
+        scored_keywords = KeywordFrame.coerce(scored_keywords).materialize()
+        ad_groups = {name: KeywordFrame.coerce(keywords).materialize() for name, keywords in ad_groups.items()}
         
         # 1. Master keywords CSV
-        df_master = pd.DataFrame(scored_keywords)
+        df_master = scored_keywords.to_dataframe()
         files['keywords_master.csv'] = df_master.to_csv(index=False)
         
         # 2. Ad groups JSON
-        files['ad_groups_search.json'] = json.dumps(ad_groups, indent=2)
+        files['ad_groups_search.json'] = json.dumps(
+            {name: keywords.to_records() for name, keywords in ad_groups.items()}, indent=2
+        )
         
         # 3. Summary JSON
         files['ad_groups_summary.json'] = json.dumps(summary, indent=2)
         
         # 4. Individual ad group CSVs
         for group_name, keywords in ad_groups.items():
-            if keywords:
-                df_group = pd.DataFrame(keywords)
+            if len(keywords):
+                df_group = keywords.to_dataframe()
                 # Select relevant columns for CSV
                 columns = ['keyword', 'avg_monthly_searches', 'competition', 'score', 
                           'suggested_cpc_start', 'suggested_cpc_ceiling', 'match_types']
@@ -153,7 +163,7 @@ class KeywordDataProcessor:
         
         return files
     
-    def _generate_markdown_report(self, summary: Dict, keywords: List[Dict]) -> str:
+    def _generate_markdown_report(self, summary: Dict, keywords: KeywordFrame) -> str:
         """Generate markdown report as string"""
         report = f"""# AdSmart AI - Keyword Research Report
 
@@ -183,7 +193,8 @@ class KeywordDataProcessor:
 |---------|---------------|-------------|-------|---------|----------|
 """
         
-        for kw in sorted(keywords, key=lambda x: x['score'], reverse=True)[:20]:
+        top_keywords = keywords.sort_by_score()
+        for kw in top_keywords.take(np.arange(min(20, len(top_keywords)))):
             # Use the original CPC fields that are always available
             cpc_low = kw.get('top_of_page_bid_low', 0)
             cpc_high = kw.get('top_of_page_bid_high', 0)
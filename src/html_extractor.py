@@ -0,0 +1,264 @@
+import codecs
+import re
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+try:
+    from lxml import etree
+except ImportError:  # lxml is optional, html.parser is always available
+    etree = None
+
+HEADING_TAGS = ('h1', 'h2', 'h3')
+NAV_TAGS = ('nav', 'menu')
+SKIP_TAGS = ('script', 'style')
+MAX_LINKS = 300
+# Browsers look for <meta charset> in the first 1024 bytes; allow for long heads
+SNIFF_BYTES = 4096
+
+_BOMS = ((codecs.BOM_UTF8, 'utf-8'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+_META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([A-Za-z0-9_.:-]+)', re.IGNORECASE)
+
+
+def available_backends() -> List[str]:
+    """Parser backends usable in this environment, fastest first"""
+    backends = ['lxml'] if etree is not None else []
+    backends.append('html.parser')
+    return backends
+
+
+def clean_text(raw_text: str) -> str:
+    """Collapse whitespace the same way the scraper always has"""
+    lines = (line.strip() for line in raw_text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return ' '.join(chunk for chunk in chunks if chunk)
+
+
+class _ContentCollector:
+    """Parser target that collects everything the scraper needs in one pass.
+
+    Follows the lxml target interface (start/end/data/close); the html.parser
+    backend drives it through _StdlibParser.
+    """
+
+    def __init__(self):
+        self.title = None
+        self.meta_description = None
+        self.headings = {tag: [] for tag in HEADING_TAGS}
+        self.navigation = []
+        self.nav_links = []
+        self.links = []
+        self.text_parts = []
+
+        self.head_done = False
+        self.text_chars = 0
+        self.navs_closed = 0
+
+        self._in_title = False
+        self._title_parts = []
+        self._skip_depth = 0
+        self._nav_depth = 0
+        self._heading_tag = None
+        self._heading_parts = []
+        self._link_parts = None
+
+    def start(self, tag, attrib):
+        tag = tag.lower()
+        if tag == 'body':
+            self.head_done = True
+        elif tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == 'title' and self.title is None:
+            self._in_title = True
+        elif tag == 'meta' and self.meta_description is None:
+            if (attrib.get('name') or '').lower() == 'description':
+                self.meta_description = attrib.get('content') or ''
+        elif tag in HEADING_TAGS and self._heading_tag is None:
+            self._heading_tag = tag
+            self._heading_parts = []
+        elif tag in NAV_TAGS:
+            self._nav_depth += 1
+        elif tag == 'a':
+            href = attrib.get('href')
+            if href and len(self.links) < MAX_LINKS:
+                self.links.append(href)
+            if self._nav_depth:
+                self._link_parts = []
+                if href:
+                    self.nav_links.append(href)
+
+    def end(self, tag):
+        tag = tag.lower()
+        if tag == 'head':
+            self.head_done = True
+        elif tag in SKIP_TAGS:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+        elif tag == 'title' and self._in_title:
+            self._in_title = False
+            self.title = ''.join(self._title_parts)
+        elif tag == self._heading_tag:
+            self.headings[tag].append(''.join(self._heading_parts).strip())
+            self._heading_tag = None
+        elif tag in NAV_TAGS:
+            self._nav_depth = max(self._nav_depth - 1, 0)
+            if not self._nav_depth:
+                self.navs_closed += 1
+        elif tag == 'a' and self._link_parts is not None:
+            link_text = ''.join(self._link_parts).strip()
+            if link_text:
+                self.navigation.append(link_text)
+            self._link_parts = None
+
+    def data(self, data):
+        if self._skip_depth:
+            return
+        self.text_parts.append(data)
+        self.text_chars += len(data.strip())
+        if self._in_title:
+            self._title_parts.append(data)
+        if self._heading_tag is not None:
+            self._heading_parts.append(data)
+        if self._link_parts is not None:
+            self._link_parts.append(data)
+
+    def comment(self, text):
+        pass
+
+    def in_open_section(self) -> bool:
+        """True while inside a title, heading, nav or skipped block"""
+        return bool(self._in_title or self._heading_tag or self._nav_depth or self._skip_depth)
+
+    def close(self) -> Dict:
+        if self._in_title:
+            self.title = ''.join(self._title_parts)
+        return {
+            'title': self.title or '',
+            'meta_description': self.meta_description or '',
+            'headings': self.headings,
+            'navigation': self.navigation,
+            'nav_links': self.nav_links,
+            'links': self.links,
+            'text': clean_text(''.join(self.text_parts))
+        }
+
+
+class _StdlibParser(HTMLParser):
+    """Feeds html.parser events into a _ContentCollector"""
+
+    def __init__(self, target: _ContentCollector, encoding: str):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+
+    def feed(self, data):
+        if isinstance(data, bytes):
+            data = self._decoder.decode(data)
+        super().feed(data)
+
+    def close(self) -> Dict:
+        super().feed(self._decoder.decode(b'', final=True))
+        super().close()
+        return self.target.close()
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+        self.target.end(tag)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+
+class ContentExtractor:
+    """Single-pass, incremental extraction of title, meta, headings, nav and text.
+
+    Without an encoding (no charset in the Content-Type header) the first
+    SNIFF_BYTES are buffered and checked for a BOM or <meta charset> before
+    parsing starts; utf-8 is the fallback.
+    """
+
+    def __init__(self, backend: str = None, encoding: str = None):
+        self.backend = backend or available_backends()[0]
+        if self.backend == 'lxml' and etree is None:
+            raise ValueError("lxml backend requested but lxml is not installed")
+        if self.backend not in ('lxml', 'html.parser'):
+            raise ValueError(f"Unknown parser backend: {self.backend}")
+
+        self.encoding = _normalize_encoding(encoding) if encoding else None
+        self.collector = _ContentCollector()
+        self._parser = None
+        self._head = b''
+        if self.encoding:
+            self._start_parser()
+
+    def _start_parser(self) -> None:
+        if self.encoding is None:
+            self.encoding = _normalize_encoding(sniff_encoding(self._head))
+        if self.backend == 'lxml':
+            self._parser = etree.HTMLParser(target=self.collector, encoding=self.encoding)
+        else:
+            self._parser = _StdlibParser(self.collector, self.encoding)
+        head, self._head = self._head, b''
+        if head:
+            self._parser.feed(head)
+
+    def feed(self, chunk) -> None:
+        """Feed the next chunk of the document (bytes or str)"""
+        if not chunk:
+            return
+        if self._parser is None:
+            if isinstance(chunk, str):
+                self.encoding = 'utf-8'  # Already decoded; nothing to sniff
+                self._start_parser()
+            else:
+                self._head += chunk
+                if len(self._head) >= SNIFF_BYTES:
+                    self._start_parser()
+                return
+        self._parser.feed(chunk)
+
+    def has_enough(self, min_text_chars: int) -> bool:
+        """Whether reading can stop: head parsed, a complete nav block and an h1 seen
+        (seed keywords come from those), and enough body text collected"""
+        collector = self.collector
+        return (collector.head_done and collector.navs_closed and collector.headings['h1']
+                and collector.text_chars >= min_text_chars and not collector.in_open_section())
+
+    def close(self) -> Dict:
+        """Finish parsing and return the extracted fields"""
+        if self._parser is None:
+            if not self._head:
+                return self.collector.close()
+            self._start_parser()
+        try:
+            return self._parser.close()
+        except Exception:
+            # lxml raises on documents it could not make sense of at all
+            return self.collector.close()
+
+
+def sniff_encoding(head: bytes) -> Optional[str]:
+    """Encoding declared by a byte order mark or <meta charset> in the start of a document"""
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    match = _META_CHARSET.search(head[:SNIFF_BYTES])
+    return match.group(1).decode('ascii') if match else None
+
+
+def _normalize_encoding(encoding: str) -> str:
+    try:
+        return codecs.lookup(encoding or 'utf-8').name
+    except LookupError:
+        return 'utf-8'
+
+
+def extract_content(html, backend: str = None, encoding: str = None) -> Dict:
+    """Extract content from a complete document in one traversal"""
+    extractor = ContentExtractor(backend=backend, encoding=encoding)
+    extractor.feed(html)
+    return extractor.close()
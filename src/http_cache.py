@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+# Bump when the extraction output changes so stale parsed results are ignored
+PARSED_FORMAT_VERSION = 3
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    # Per-writer temp name: batch workers in other processes may store the same page
+    tmp_path = path.with_suffix(f"{path.suffix}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class HTTPCache:
+    """On-disk page cache with ETag/Last-Modified revalidation.
+
+    Layout under cache_dir:
+        pages/<sha256(url)>.json   validators + content hash for a URL
+        bodies/<content hash>      raw response body
+        parsed/<content hash>.json extraction result for that body
+    """
+
+    def __init__(self, cache_dir: str):
+        self.root = Path(cache_dir)
+        self.pages_dir = self.root / 'pages'
+        self.bodies_dir = self.root / 'bodies'
+        self.parsed_dir = self.root / 'parsed'
+        for directory in (self.pages_dir, self.bodies_dir, self.parsed_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+        self.stats = {'revalidated': 0, 'downloaded': 0, 'parsed_hits': 0, 'parsed_misses': 0}
+
+    def _page_path(self, url: str) -> Path:
+        return self.pages_dir / f"{_sha256(url.encode('utf-8'))}.json"
+
+    def get_entry(self, url: str) -> Optional[Dict]:
+        """Cached validators for a URL, or None if the body is not on disk"""
+        try:
+            entry = json.loads(self._page_path(url).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        if not (self.bodies_dir / entry['content_hash']).exists():
+            return None
+        return entry
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since headers for a conditional GET"""
+        entry = self.get_entry(url)
+        if not entry:
+            return {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def load_body(self, entry: Dict) -> bytes:
+        self.stats['revalidated'] += 1
+        return (self.bodies_dir / entry['content_hash']).read_bytes()
+
+    def store(self, url: str, body: bytes, headers, encoding: str = None) -> Dict:
+        """Save a 200 response and return its cache entry"""
+        content_hash = _sha256(body)
+        body_path = self.bodies_dir / content_hash
+        if not body_path.exists():
+            _atomic_write(body_path, body)
+
+        entry = {
+            'url': url,
+            'etag': headers.get('etag'),
+            'last_modified': headers.get('last-modified'),
+            'encoding': encoding,
+            'content_hash': content_hash
+        }
+        _atomic_write(self._page_path(url), json.dumps(entry).encode('utf-8'))
+        self.stats['downloaded'] += 1
+        return entry
+
+    def _parsed_path(self, content_hash: str) -> Path:
+        return self.parsed_dir / f"{content_hash}.v{PARSED_FORMAT_VERSION}.json"
+
+    def get_parsed(self, content_hash: str) -> Optional[Dict]:
+        """Extraction result for an identical body seen before"""
+        try:
+            result = json.loads(self._parsed_path(content_hash).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            self.stats['parsed_misses'] += 1
+            return None
+        self.stats['parsed_hits'] += 1
+        return result
+
+    def store_parsed(self, content_hash: str, result: Dict) -> None:
+        _atomic_write(self._parsed_path(content_hash), json.dumps(result).encode('utf-8'))
@@ -0,0 +1,209 @@
+import contextvars
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+METRIC_PREFIX = 'adsmart'
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process so far (None where getrusage is unavailable)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux reports KiB
+
+
+class Instrumentation:
+    """Timers, counters and peak-RSS snapshots for a pipeline run.
+
+    Stages are timed with stage(), external calls with timer() (count, total
+    and max seconds per name, e.g. 'serp.request'), and events with count()
+    (cache hits, retries, LLM tokens). Stages run in worker threads and
+    requests on the shared event loop, so every update takes the lock.
+    Peak RSS is per process, so it is shared by runs that overlap.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Start a new run"""
+        with self._lock:
+            self.started_at = datetime.now(timezone.utc)
+            self._started = time.perf_counter()
+            self._finished = None
+            self.counters = {}
+            self.timers = {}
+            self.stages = {}
+
+    def finish(self) -> None:
+        """End the run, freezing its duration for exports made later"""
+        with self._lock:
+            self._finished = time.perf_counter()
+
+    def count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            timer = self.timers.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+            timer['count'] += 1
+            timer['total'] += seconds
+            timer['max'] = max(timer['max'], seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a pipeline stage with peak RSS before and after; yields its record for annotations"""
+        record = {'peak_rss_before': peak_rss_bytes()}
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            finished = time.perf_counter()
+            record.update(start=started - self._started, duration=finished - started,
+                          peak_rss_after=peak_rss_bytes())
+            with self._lock:
+                self.stages[name] = record
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'started_at': self.started_at.isoformat(),
+                'duration': round((self._finished or time.perf_counter()) - self._started, 3),
+                'peak_rss_bytes': peak_rss_bytes(),
+                'stages': {name: dict(record) for name, record in self.stages.items()},
+                'timers': {name: dict(timer) for name, timer in self.timers.items()},
+                'counters': dict(self.counters)
+            }
+
+    def to_json(self) -> str:
+        """JSON run profile"""
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_openmetrics(self) -> str:
+        """Prometheus/OpenMetrics text exposition of the run"""
+        profile = self.to_dict()
+        lines = []
+
+        def family(name, metric_type, help_text, samples):
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            for suffix, labels, value in samples:
+                label_text = ','.join(f'{key}="{_escape_label(str(val))}"' for key, val in labels.items())
+                lines.append(f"{METRIC_PREFIX}_{name}{suffix}{{{label_text}}} {value}" if label_text
+                             else f"{METRIC_PREFIX}_{name}{suffix} {value}")
+
+        family('run_duration_seconds', 'gauge', "Wall time of the run.", [('', {}, profile['duration'])])
+        if profile['peak_rss_bytes'] is not None:
+            family('peak_rss_bytes', 'gauge', "Peak resident set size of the process.",
+                   [('', {}, profile['peak_rss_bytes'])])
+
+        stages = profile['stages'].items()
+        family('stage_duration_seconds', 'gauge', "Wall time per pipeline stage.",
+               [('', {'stage': name}, round(record['duration'], 6)) for name, record in stages])
+        family('stage_peak_rss_bytes', 'gauge', "Peak resident set size after each stage.",
+               [('', {'stage': name}, record['peak_rss_after'])
+                for name, record in stages if record['peak_rss_after'] is not None])
+
+        timers = profile['timers'].items()
+        family('call_duration_seconds', 'summary', "Latency of external calls.",
+               [sample for name, timer in timers for sample in (
+                   ('_count', {'call': name}, timer['count']),
+                   ('_sum', {'call': name}, round(timer['total'], 6))
+               )])
+        family('call_duration_max_seconds', 'gauge', "Slowest external call.",
+               [('', {'call': name}, round(timer['max'], 6)) for name, timer in timers])
+
+        family('events', 'counter', "Call, cache, retry and token counts.",
+               [('_total', {'name': name}, value) for name, value in profile['counters'].items()])
+
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def summary_markdown(self) -> str:
+        """Run profile section for run_report.md"""
+        profile = self.to_dict()
+        report = f"""## Run Profile
+
+- **Total Time**: {profile['duration']:.2f}s
+- **Peak Memory**: {_format_bytes(profile['peak_rss_bytes'])}
+
+### Stages
+
+| Stage | Start | Duration | Peak Memory After |
+|-------|-------|----------|-------------------|
+"""
+        for name, record in sorted(profile['stages'].items(), key=lambda item: item[1]['start']):
+            resumed = ' (checkpoint)' if record.get('resumed') else ''
+            report += (f"| {name}{resumed} | +{record['start']:.2f}s | {record['duration']:.2f}s "
+                       f"| {_format_bytes(record['peak_rss_after'])} |\n")
+
+        if profile['timers']:
+            report += """
+### External Calls
+
+| Call | Count | Total | Mean | Max |
+|------|-------|-------|------|-----|
+"""
+            for name, timer in sorted(profile['timers'].items()):
+                report += (f"| {name} | {timer['count']} | {timer['total']:.2f}s "
+                           f"| {timer['total'] / timer['count']:.3f}s | {timer['max']:.3f}s |\n")
+
+        if profile['counters']:
+            report += "\n### Counters\n\n"
+            for name, value in sorted(profile['counters'].items()):
+                report += f"- **{name}**: {value:,}\n"
+
+        return report
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bytes(value: Optional[int]) -> str:
+    return 'n/a' if value is None else f"{value / 2 ** 20:,.1f} MiB"
+
+
+_instrumentation = Instrumentation()
+_current = contextvars.ContextVar('instrumentation', default=None)
+
+
+def get_instrumentation() -> Instrumentation:
+    """The current run's instrumentation (see use_instrumentation), else the process-wide one"""
+    return _current.get() or _instrumentation
+
+
+@contextmanager
+def use_instrumentation(instrumentation: Instrumentation):
+    """Record everything called from this context into instrumentation.
+
+    Context variables follow coroutines submitted to the shared event loop; thread
+    pools need their tasks submitted with contextvars.copy_context().run, so
+    concurrent pipelines (Streamlit sessions, batch threads) keep separate metrics.
+    """
+    token = _current.set(instrumentation)
+    try:
+        yield instrumentation
+    finally:
+        _current.reset(token)
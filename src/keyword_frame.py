@@ -0,0 +1,303 @@
+from typing import Dict, Iterable, Iterator, List, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from src.keyword_rules import RULES
+
+COMPETITION_LEVELS = ('LOW', 'MEDIUM', 'HIGH')
+CATEGORIES = ('brand_terms', 'category_terms', 'competitor_terms', 'location_terms', 'informational_terms',
+              'uncategorized_terms')
+
+# Column name -> dtype. Order is the column order of exported records/CSVs.
+COLUMNS = {
+    'keyword': object,
+    'avg_monthly_searches': np.int64,
+    'competition': np.int8,             # index into COMPETITION_LEVELS
+    'competition_score': np.float64,
+    'top_of_page_bid_low': np.int64,
+    'top_of_page_bid_high': np.int64,
+    'total_results': np.int64,
+    'score': np.float64,
+    'match_types': object,
+    'suggested_cpc_start': np.float64,
+    'suggested_cpc_ceiling': np.float64,
+    'category': np.int8,                # index into CATEGORIES, -1 if uncategorized
+    'is_location_variant': np.bool_,
+}
+
+# Columns that only exist once a stage has filled them in
+OPTIONAL_COLUMNS = ('score', 'match_types', 'suggested_cpc_start', 'suggested_cpc_ceiling', 'category')
+
+_COMPETITION_CODES = {level: code for code, level in enumerate(COMPETITION_LEVELS)}
+_CATEGORY_CODES = {category: code for code, category in enumerate(CATEGORIES)}
+
+
+def competition_code(level: str) -> int:
+    return _COMPETITION_CODES.get(level, _COMPETITION_CODES['MEDIUM'])
+
+
+def category_code(category: str) -> int:
+    return _CATEGORY_CODES.get(category, -1)
+
+
+def round_values(values, ndigits: int) -> np.ndarray:
+    """Elementwise built-in round(); np.round drifts on halfway cases like 14.025"""
+    return np.array([round(value, ndigits) for value in np.asarray(values, dtype=np.float64).tolist()],
+                    dtype=np.float64)
+
+
+def _object_column(values) -> np.ndarray:
+    """1-D object array, even when the values are lists or tuples"""
+    values = list(values)
+    column = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        column[i] = value
+    return column
+
+
+def cast_column(name: str, values, length: int) -> np.ndarray:
+    """Values as a column of the given length and the column's dtype (scalars are broadcast)"""
+    dtype = COLUMNS[name]
+    if dtype is object:
+        return _object_column(values)
+    column = np.asarray(values, dtype=dtype)
+    if column.shape == ():
+        column = np.full(length, column, dtype=dtype)
+    return column
+
+
+def _empty_column(name: str, length: int) -> np.ndarray:
+    dtype = COLUMNS[name]
+    if name == 'category':
+        return np.full(length, -1, dtype=dtype)
+    if dtype is np.float64:
+        return np.full(length, np.nan)
+    if dtype is object:
+        return np.full(length, None, dtype=object)
+    return np.zeros(length, dtype=dtype)
+
+
+class KeywordFrame:
+    """Columnar container for keyword records.
+
+    Every stage from dedup to export works on the typed NumPy columns. Iterating,
+    indexing with an int or calling to_records() gives the old list-of-dict view
+    for code that still expects it.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], present: Iterable[str] = ()):
+        length = len(columns['keyword'])
+        self.columns = {name: columns[name] if name in columns else _empty_column(name, length)
+                        for name in COLUMNS}
+        self.present = set(present) & set(OPTIONAL_COLUMNS)
+        self.variants = None  # Lazy LocationVariants of these rows, if any
+        self._rule_masks = None  # keyword_rules bitmasks, computed on first use
+
+    def __getstate__(self):
+        # Sets pickle in hash order, which differs between processes; checkpoint keys hash these bytes
+        state = dict(self.__dict__)
+        state['present'] = sorted(self.present)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.present = set(self.present)
+
+    @classmethod
+    def empty(cls) -> 'KeywordFrame':
+        return cls({'keyword': np.empty(0, dtype=object)})
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> 'KeywordFrame':
+        """Build a frame from keyword dicts (any iterable, consumed once)"""
+        values = {name: [] for name in COLUMNS}
+        rule_masks = []
+        present = set()
+        for record in records:
+            rule_masks.append(record.get('_rules'))
+            values['keyword'].append(record['keyword'])
+            values['avg_monthly_searches'].append(record['avg_monthly_searches'])
+            values['competition'].append(competition_code(record.get('competition')))
+            values['competition_score'].append(record.get('competition_score', 0.5))
+            values['top_of_page_bid_low'].append(record.get('top_of_page_bid_low', 0))
+            values['top_of_page_bid_high'].append(record.get('top_of_page_bid_high', 0))
+            values['total_results'].append(record.get('total_results', 0))
+            values['is_location_variant'].append(record.get('is_location_variant', False))
+            values['score'].append(record.get('score', np.nan))
+            values['match_types'].append(record.get('match_types'))
+            values['suggested_cpc_start'].append(record.get('suggested_cpc_start', np.nan))
+            values['suggested_cpc_ceiling'].append(record.get('suggested_cpc_ceiling', np.nan))
+            values['category'].append(category_code(record.get('category')))
+            present.update(name for name in OPTIONAL_COLUMNS if name in record)
+
+        columns = {}
+        for name, dtype in COLUMNS.items():
+            if dtype is object:
+                column = _object_column(values[name])
+            else:
+                column = np.asarray(values[name], dtype=dtype)
+            columns[name] = column
+        frame = cls(columns, present)
+        if None not in rule_masks:
+            frame._rule_masks = np.asarray(rule_masks, dtype=np.int64)
+        return frame
+
+    @classmethod
+    def coerce(cls, keywords: Union['KeywordFrame', Iterable[Dict]]) -> 'KeywordFrame':
+        """Accept a frame as-is, or convert list-of-dict records"""
+        if isinstance(keywords, KeywordFrame):
+            return keywords
+        return cls.from_records(keywords)
+
+    @classmethod
+    def concat(cls, frames: Sequence['KeywordFrame']) -> 'KeywordFrame':
+        frames = [frame for frame in frames if frame is not None]
+        if not frames:
+            return cls.empty()
+        columns = {name: np.concatenate([frame.columns[name] for frame in frames]) for name in COLUMNS}
+        non_empty = [frame for frame in frames if len(frame)] or frames
+        result = cls(columns, set.intersection(*(frame.present for frame in non_empty)))
+        if all(frame._rule_masks is not None for frame in frames):
+            result._rule_masks = np.concatenate([frame._rule_masks for frame in frames])
+        return result
+
+    def __len__(self) -> int:
+        return len(self.columns['keyword'])
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        return self._record(int(key))
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self._record(i)
+
+    def __repr__(self) -> str:
+        return f"KeywordFrame({len(self)} keywords)"
+
+    @property
+    def keywords(self) -> List[str]:
+        return self.columns['keyword'].tolist()
+
+    @property
+    def total_count(self) -> int:
+        """Rows plus lazy location variants"""
+        return len(self) + (len(self.variants) if self.variants is not None else 0)
+
+    def full_column(self, name: str) -> np.ndarray:
+        """Column values for the rows followed by those of the lazy variants"""
+        if self.variants is None:
+            return self.columns[name]
+        return np.concatenate([self.columns[name], self.variants[name]])
+
+    def keyword_at(self, i: int) -> str:
+        """Keyword at position i of full_column() order; builds only that one variant string"""
+        if i < len(self):
+            return self.columns['keyword'][i]
+        return self.variants.keyword(i - len(self))
+
+    def rule_masks(self) -> np.ndarray:
+        """keyword_rules bitmask per row; matched once, then cached and carried through take()"""
+        if self._rule_masks is None:
+            self._rule_masks = RULES.masks(self.columns['keyword'])
+        return self._rule_masks
+
+    def set_column(self, name: str, values) -> None:
+        """Replace a column, casting to its dtype"""
+        self.columns[name] = cast_column(name, values, len(self))
+        if name in OPTIONAL_COLUMNS:
+            self.present.add(name)
+
+    def update_rows(self, rows, source: 'KeywordFrame', names: Sequence[str]) -> None:
+        """Copy columns from source (one row per entry in rows) into these rows"""
+        for name in names:
+            self.columns[name][rows] = source.columns[name]
+            if name in OPTIONAL_COLUMNS:
+                self.present.add(name)
+
+    def take(self, indices) -> 'KeywordFrame':
+        """Rows at the given positions, in that order (copies)"""
+        indices = np.asarray(indices, dtype=np.int64)
+        frame = KeywordFrame({name: column[indices] for name, column in self.columns.items()}, self.present)
+        if self._rule_masks is not None:
+            frame._rule_masks = self._rule_masks[indices]
+        return frame
+
+    def copy(self) -> 'KeywordFrame':
+        """Independent copy, lazy variants included, for stages that annotate their input"""
+        rows = np.arange(len(self))
+        frame = self.take(rows)
+        if self.variants is not None:
+            frame.variants = self.variants.rebase(frame, rows)
+        return frame
+
+    def filter(self, mask) -> 'KeywordFrame':
+        return self.take(np.flatnonzero(mask))
+
+    def materialize(self) -> 'KeywordFrame':
+        """Plain frame with the lazy location variants expanded into rows, merged in by score"""
+        if self.variants is None or not len(self.variants):
+            return self
+        frame = KeywordFrame.concat([self, self.variants.to_frame()])
+        if 'score' in frame.present:
+            frame = frame.sort_by_score()
+        return frame
+
+    def sort_by_score(self) -> 'KeywordFrame':
+        """Highest score first; ties keep their current order"""
+        return self.take(np.argsort(-self.columns['score'], kind='stable'))
+
+    def competition_labels(self) -> np.ndarray:
+        return np.asarray(COMPETITION_LEVELS, dtype=object)[self.columns['competition']]
+
+    def category_labels(self) -> np.ndarray:
+        labels = np.asarray(CATEGORIES + (None,), dtype=object)
+        return labels[self.columns['category']]  # -1 picks the trailing None
+
+    def _record(self, i: int) -> Dict:
+        columns = self.columns
+        record = {
+            'keyword': columns['keyword'][i],
+            'avg_monthly_searches': int(columns['avg_monthly_searches'][i]),
+            'competition': COMPETITION_LEVELS[columns['competition'][i]],
+            'competition_score': float(columns['competition_score'][i]),
+            'top_of_page_bid_low': int(columns['top_of_page_bid_low'][i]),
+            'top_of_page_bid_high': int(columns['top_of_page_bid_high'][i]),
+            'total_results': int(columns['total_results'][i]),
+        }
+        if columns['is_location_variant'][i]:
+            record['is_location_variant'] = True
+        if 'score' in self.present:
+            record['score'] = float(columns['score'][i])
+        if 'match_types' in self.present and columns['match_types'][i] is not None:
+            record['match_types'] = list(columns['match_types'][i])
+            record['suggested_cpc_start'] = float(columns['suggested_cpc_start'][i])
+            record['suggested_cpc_ceiling'] = float(columns['suggested_cpc_ceiling'][i])
+        if 'category' in self.present and columns['category'][i] >= 0:
+            record['category'] = CATEGORIES[columns['category'][i]]
+        return record
+
+    def to_records(self) -> List[Dict]:
+        """List-of-dict view, for JSON export and legacy callers"""
+        return [self._record(i) for i in range(len(self))]
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Build a DataFrame straight from the columns"""
+        data = {}
+        for name in COLUMNS:
+            if name in OPTIONAL_COLUMNS and name not in self.present:
+                continue
+            if name == 'competition':
+                data[name] = self.competition_labels()
+            elif name == 'category':
+                data[name] = self.category_labels()
+            elif name == 'is_location_variant':
+                # Blank for base keywords, as in the list-of-dict export
+                data[name] = np.where(self.columns[name], True, None)
+            elif name == 'match_types':
+                data[name] = [list(value) if value is not None else None for value in self.columns[name]]
+            else:
+                data[name] = self.columns[name]
+        return pd.DataFrame(data)
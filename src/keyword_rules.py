@@ -0,0 +1,74 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Sequence
+
+import numpy as np
+
+# Rule name -> terms. Every keyword rule in the pipeline reads its hits from one matcher pass.
+RULE_TERMS = {
+    # SERP metric estimates (keyword_research)
+    'commercial': ('buy', 'purchase', 'order', 'price', 'cost', 'best', 'review'),
+    'convenience': ('near me', 'online', 'delivery'),
+    'transactional': ('buy', 'purchase', 'order', 'price', 'cost', 'hire', 'service'),
+    'informational_cpc': ('how', 'what', 'why', 'guide', 'tips', 'tutorial', 'free'),
+    'comparison': ('vs', 'alternative', 'competitor', 'compare'),
+    'local_cpc': ('near me', 'in', 'mumbai', 'delhi', 'bangalore', 'local'),
+    # Location variants (data_processor)
+    'location_relevant': (
+        'service', 'repair', 'store', 'shop', 'clinic', 'doctor', 'dentist',
+        'restaurant', 'delivery', 'installation', 'contractor', 'lawyer',
+        'real estate', 'plumber', 'electrician', 'near me', 'local'
+    ),
+    # Rule-based categorization (llm_helper fallback)
+    'location_intent': ('near me', 'in', 'city', 'local', 'area'),
+    'informational': ('how', 'what', 'best', 'top', 'review', 'guide', 'tips'),
+}
+
+
+class KeywordMatcher:
+    """Finds every rule term in a keyword with one compiled regex pass.
+
+    Terms match on word boundaries (a plural 's'/'es' is allowed), so 'in' no
+    longer fires on "online" and 'order' no longer fires on "border". The result
+    is a bitmask with one bit per rule.
+    """
+
+    def __init__(self, rules: Dict[str, Sequence[str]]):
+        self.bits = {name: 1 << i for i, name in enumerate(rules)}
+        self._term_masks = {}
+        for name, terms in rules.items():
+            for term in terms:
+                term = term.lower()
+                self._term_masks[term] = self._term_masks.get(term, 0) | self.bits[name]
+
+        # Longest first so multi-word terms win over their prefixes
+        alternation = '|'.join(re.escape(term) for term in sorted(self._term_masks, key=len, reverse=True))
+        self._pattern = re.compile(rf"(?<!\w)({alternation})(?:e?s)?(?!\w)") if alternation else None
+
+    def mask(self, keyword: str) -> int:
+        if self._pattern is None:
+            return 0
+        mask = 0
+        for term in self._pattern.findall(keyword.lower()):
+            mask |= self._term_masks[term]
+        return mask
+
+    def masks(self, keywords: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self.mask(keyword) for keyword in keywords), dtype=np.int64)
+
+    def has(self, mask: int, rule: str) -> bool:
+        return bool(mask & self.bits[rule])
+
+
+RULES = KeywordMatcher(RULE_TERMS)
+
+
+def rule_mask(keyword: str) -> int:
+    """Rule bitmask of a keyword against the shared RULES matcher"""
+    return RULES.mask(keyword)
+
+
+@lru_cache(maxsize=32)
+def location_matcher(cities: tuple) -> KeywordMatcher:
+    """Matcher for 'already mentions one of these cities', built once per location list"""
+    return KeywordMatcher({'city': cities})
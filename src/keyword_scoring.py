@@ -0,0 +1,98 @@
+import weakref
+from typing import Dict
+
+import numpy as np
+
+from src.keyword_frame import KeywordFrame, round_values
+
+# Weight keys in the order of the component matrix columns
+SCORING_WEIGHTS = ('search_volume_weight', 'cpc_weight', 'competition_weight')
+
+
+class KeywordScorer:
+    """Vectorized keyword scoring with cached normalized components.
+
+    The min/max normalization of volume and CPC is fixed when the scorer is
+    built, and the (volume, cpc, competition) component matrix of every frame
+    it has seen is cached. Rescoring with new weights is then one dot product
+    and a sort, with no pipeline rerun.
+
+    Lazy location variants are scored from their base rows' metrics and
+    count towards the normalization ranges, but are never expanded.
+    """
+
+    def __init__(self, keywords: KeywordFrame):
+        volumes = keywords.full_column('avg_monthly_searches').astype(np.float64)
+        cpcs = keywords.full_column('top_of_page_bid_high').astype(np.float64)
+        self.volume_range = (volumes.min(), volumes.max()) if len(volumes) else (0.0, 0.0)
+        self.cpc_range = (cpcs.min(), cpcs.max()) if len(cpcs) else (0.0, 0.0)
+        self.frame = keywords
+        self._components = weakref.WeakKeyDictionary()
+        # Row order each frame had when first seen; ties always fall back to it,
+        # so moving the weights away and back gives the original ranking
+        self._positions = weakref.WeakKeyDictionary()
+
+    def components(self, keywords) -> np.ndarray:
+        """(n, 3) matrix of normalized volume, CPC and competition terms (frame or LocationVariants)"""
+        cached = self._components.get(keywords)
+        if cached is not None:
+            return cached
+
+        volumes = keywords['avg_monthly_searches'].astype(np.float64)
+        cpcs = keywords['top_of_page_bid_high'].astype(np.float64)
+        volume_min, volume_max = self.volume_range
+        cpc_min, cpc_max = self.cpc_range
+
+        # Normalize search volume (higher is better)
+        if volume_max > volume_min:
+            volume_norm = (volumes - volume_min) / (volume_max - volume_min)
+        else:
+            volume_norm = np.full(len(keywords), 0.5)
+
+        # Normalize CPC (lower is better for scoring)
+        if cpc_max > cpc_min:
+            cpc_norm = 1 - (cpcs - cpc_min) / (cpc_max - cpc_min)
+        else:
+            cpc_norm = np.full(len(keywords), 0.5)
+
+        # Competition score (lower is better)
+        comp_norm = 1 - keywords['competition_score']
+
+        components = np.column_stack([volume_norm, cpc_norm, comp_norm])
+        self._components[keywords] = components
+        return components
+
+    def score(self, weights: Dict[str, float], keywords=None) -> np.ndarray:
+        """Weighted scores, rounded to 3 places"""
+        keywords = self.frame if keywords is None else keywords
+        weight_vector = np.array([weights[name] for name in SCORING_WEIGHTS], dtype=np.float64)
+        return round_values(self.components(keywords) @ weight_vector, 3)
+
+    def rescore(self, weights: Dict[str, float], keywords: KeywordFrame = None) -> KeywordFrame:
+        """Set scores on the frame and its variants, keeping row order"""
+        keywords = self.frame if keywords is None else keywords
+        keywords.set_column('score', self.score(weights, keywords))
+        if keywords.variants is not None:
+            keywords.variants.set_column('score', self.score(weights, keywords.variants))
+        return keywords
+
+    def rank(self, weights: Dict[str, float], keywords: KeywordFrame = None) -> KeywordFrame:
+        """Set scores on the frame and return it sorted by score (highest first)"""
+        keywords = self.frame if keywords is None else keywords
+        components = self.components(keywords)
+        positions = self._positions.get(keywords)
+        if positions is None:
+            positions = np.arange(len(keywords))
+        self.rescore(weights, keywords)
+
+        order = np.lexsort((positions, -keywords['score']))
+        ranked = keywords.take(order)
+        self._components[ranked] = components[order]
+        self._positions[ranked] = positions[order]
+        if keywords.variants is not None:
+            # Variants keep their own order, so their components carry over unchanged
+            ranked.variants = keywords.variants.rebase(ranked, order)
+            self._components[ranked.variants] = self.components(keywords.variants)
+        if keywords is self.frame:
+            self.frame = ranked
+        return ranked
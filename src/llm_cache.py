@@ -0,0 +1,201 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_DB_PATH = './data/cache/llm_cache.sqlite3'
+DEFAULT_TTL = 30 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 50000
+
+# SQLite caps host parameters per statement; batch lookups stay under it
+_BATCH = 500
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so indentation changes in the source don't miss the cache"""
+    return ' '.join(prompt.split())
+
+
+def prompt_key(model: str, temperature: float, prompt: str) -> str:
+    payload = json.dumps([model, float(temperature), normalize_prompt(prompt)], separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def normalize_keyword(keyword: str) -> str:
+    return ' '.join(keyword.lower().split())
+
+
+class LLMCache:
+    """SQLite store of LLM responses and per-keyword categories.
+
+    Responses are keyed by (model, temperature, normalized prompt hash). Both
+    tables expire entries after ttl seconds and are trimmed to max_entries rows,
+    least recently used first.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, ttl: int = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS keyword_categories (
+                model TEXT NOT NULL,
+                keyword TEXT NOT NULL,
+                category TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, keyword)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_used ON llm_responses (last_used)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_category_used ON keyword_categories (last_used)")
+        self._conn.commit()
+
+    def get_response(self, model: str, temperature: float, prompt: str) -> Optional[str]:
+        """Fresh cached completion text for this prompt, or None"""
+        key = prompt_key(model, temperature, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] <= self.ttl:
+                self._conn.execute("UPDATE llm_responses SET last_used = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+
+        if row is None or now - row[1] > self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def set_response(self, model: str, temperature: float, prompt: str, response: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, model, response, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (prompt_key(model, temperature, prompt), model, response, now, now)
+            )
+            self._evict('llm_responses')
+            self._conn.commit()
+
+    def get_categories(self, model: str, keywords: Iterable[str]) -> Dict[str, str]:
+        """Cached category per normalized keyword, for those that have a fresh one"""
+        names = list({normalize_keyword(keyword) for keyword in keywords})
+        now = time.time()
+        found = {}
+        with self._lock:
+            for start in range(0, len(names), _BATCH):
+                batch = names[start:start + _BATCH]
+                rows = self._conn.execute(
+                    f"SELECT keyword, category FROM keyword_categories WHERE model = ? AND created_at >= ? "
+                    f"AND keyword IN ({','.join('?' * len(batch))})",
+                    [model, now - self.ttl, *batch]
+                ).fetchall()
+                found.update(rows)
+            self._conn.executemany(
+                "UPDATE keyword_categories SET last_used = ? WHERE model = ? AND keyword = ?",
+                [(now, model, name) for name in found]
+            )
+            self._conn.commit()
+
+        self.hits += len(found)
+        self.misses += len(names) - len(found)
+        return found
+
+    def labeled_keywords(self, model: str) -> List[Tuple[str, str]]:
+        """Every fresh (keyword, category) answer for a model, e.g. to train a local categorizer"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT keyword, category FROM keyword_categories WHERE model = ? AND created_at >= ? ORDER BY keyword",
+                (model, time.time() - self.ttl)
+            ).fetchall()
+
+    def set_categories(self, model: str, categories: Dict[str, str]) -> None:
+        """Store keyword -> category answers"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO keyword_categories (model, keyword, category, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(model, normalize_keyword(keyword), category, now, now) for keyword, category in categories.items()]
+            )
+            self._evict('keyword_categories')
+            self._conn.commit()
+
+    def _evict(self, table: str) -> None:
+        """Drop expired rows, then least recently used ones past max_entries (caller holds the lock)"""
+        self._conn.execute(f"DELETE FROM {table} WHERE created_at < ?", (time.time() - self.ttl,))
+        excess = self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+
+    def purge(self) -> int:
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM llm_responses").rowcount
+            deleted += self._conn.execute("DELETE FROM keyword_categories").rowcount
+            self._conn.commit()
+        return deleted
+
+    def stats(self) -> Dict:
+        with self._lock:
+            responses = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+            keywords = self._conn.execute("SELECT COUNT(*) FROM keyword_categories").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'entries': {'responses': responses, 'keyword_categories': keywords}
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv=None):
+    """CLI: python -m src.llm_cache {stats,purge}"""
+    parser = argparse.ArgumentParser(prog='python -m src.llm_cache', description="Manage the LLM response cache")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Cache database path")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('stats', help="Show entry counts")
+    commands.add_parser('purge', help="Delete every cached response and keyword category")
+    args = parser.parse_args(argv)
+
+    cache = LLMCache(args.db)
+    if args.command == 'stats':
+        print(json.dumps(cache.stats()['entries'], indent=2))
+    elif args.command == 'purge':
+        print(f"Purged {cache.purge()} cached entries")
+    cache.close()
+
+
+if __name__ == '__main__':
+    main()
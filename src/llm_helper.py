@@ -1,14 +1,34 @@
-from openai import OpenAI
-from typing import List, Dict
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple
 import json
 import os
 from dotenv import load_dotenv
 
+from src.client_pool import openai_client
+from src.instrumentation import get_instrumentation
+from src.keyword_rules import RULES, rule_mask
+from src.llm_cache import LLMCache, normalize_keyword
+
 load_dotenv()
 
+# Ad group for keywords the LLM did not place in any category
+LEFTOVER_CATEGORY = 'uncategorized_terms'
+
+MODEL = "gpt-3.5-turbo"
+
 class LLMHelper:
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+    def __init__(self, max_workers: int = 4, chunk_token_budget: int = 600, max_attempts: int = 2,
+                 cache: LLMCache = None, rate_limiter=None):
+        self.client = openai_client(os.getenv('OPENAI_API_KEY'))
+        self.cache = cache
+        # Optional TokenBucket paced before every API call (cache hits are free)
+        self.rate_limiter = rate_limiter
+        # Categorization sharding: keyword tokens per request (the answer echoes them back
+        # within max_tokens=1000), concurrent requests, and tries per chunk before fallback
+        self.chunk_token_budget = chunk_token_budget
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
     
     def generate_seed_keywords(self, brand_content: Dict, competitor_content: Dict) -> List[str]:
         """Generate seed keywords using LLM based on website content"""
@@ -38,30 +58,124 @@ class LLMHelper:
         ["keyword1", "keyword2", ...]
         """
         
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=500
-            )
-            
-            content = response.choices[0].message.content.strip()
+        def parse(content):
             # Extract JSON from response
             start_idx = content.find('[')
             end_idx = content.rfind(']') + 1
             json_str = content[start_idx:end_idx]
             
-            keywords = json.loads(json_str)
-            return keywords
+            return json.loads(json_str)
+        
+        try:
+            return self._complete(prompt, temperature=0.7, max_tokens=500, parse=parse)
             
         except Exception as e:
             print(f"Error generating seed keywords: {e}")
             return []
     
-    def categorize_keywords(self, keywords: List[Dict]) -> Dict[str, List[Dict]]:
-        """Categorize keywords into ad groups using LLM"""
+    def cached_categories(self, keywords: List[Dict]) -> Tuple[Dict[str, List[Dict]], List[Dict]]:
+        """Split keyword records into the categories the LLM gave them on earlier runs and the rest"""
+        known = self.cache.get_categories(MODEL, (kw['keyword'] for kw in keywords)) if self.cache else {}
+        merged = {}
+        remaining = []
+        for kw in keywords:
+            category = known.get(normalize_keyword(kw['keyword']))
+            if category:
+                merged.setdefault(category, []).append(kw)
+            else:
+                remaining.append(kw)
+        if known:
+            print(f"{len(keywords) - len(remaining)} keywords categorized from cache")
+            get_instrumentation().count('llm.keyword_cache_hits', len(keywords) - len(remaining))
+        return merged, remaining
+    
+    def categorize_keywords(self, keywords: List[Dict], check_cache: bool = True) -> Dict[str, List[Dict]]:
+        """Categorize keywords into ad groups using LLM.
+        
+        Keywords are split into token-budgeted chunks that are categorized concurrently;
+        failed chunks are retried, then fall back to rule-based categorization on their own.
+        check_cache=False skips the per-keyword cache lookup for callers that already did it.
+        """
+        if not keywords:
+            return self._fallback_categorization(keywords)
+        
+        # Keywords categorized on an earlier run are never sent again
+        if check_cache:
+            merged, remaining = self.cached_categories(keywords)
+        else:
+            merged, remaining = {}, list(keywords)
+        if not remaining:
+            return merged
+        
+        chunks = self._chunk_keywords(remaining)
+        print(f"Categorizing {len(remaining)} keywords in {len(chunks)} chunks")
         
+        results = [None] * len(chunks)
+        pending = list(range(len(chunks)))
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+            for attempt in range(self.max_attempts):
+                futures = {i: executor.submit(contextvars.copy_context().run, self._categorize_chunk, chunks[i])
+                           for i in pending}
+                failed = []
+                for i, future in futures.items():
+                    try:
+                        results[i] = future.result()
+                    except Exception as e:
+                        print(f"Error categorizing keywords (chunk {i + 1}/{len(chunks)}, attempt {attempt + 1}): {e}")
+                        get_instrumentation().count('llm.errors')
+                        failed.append(i)
+                pending = failed
+                if not pending:
+                    break
+                if attempt < self.max_attempts - 1:
+                    get_instrumentation().count('llm.retries', len(pending))
+        
+        # Remember the LLM's answers per keyword; fallback chunks and leftovers are not cached
+        answered = {}
+        for chunk_result in results:
+            if chunk_result is None:
+                continue
+            for category, kw_list in chunk_result.items():
+                if category != LEFTOVER_CATEGORY:
+                    for kw in kw_list:
+                        answered.setdefault(kw['keyword'], category)
+        if self.cache and answered:
+            self.cache.set_categories(MODEL, answered)
+        
+        for i in pending:
+            results[i] = self._fallback_categorization(chunks[i])
+            get_instrumentation().count('llm.fallback_keywords', len(chunks[i]))
+        
+        # Merge in chunk order so the output doesn't depend on which chunk finished first
+        for chunk_result in results:
+            for category, kw_list in chunk_result.items():
+                merged.setdefault(category, []).extend(kw_list)
+        return merged
+    
+    def _chunk_keywords(self, keywords: List[Dict]) -> List[List[Dict]]:
+        """Split keywords so each chunk's answer fits comfortably in the response token limit"""
+        chunks = []
+        current = []
+        current_tokens = 0
+        for kw in keywords:
+            tokens = self._estimate_tokens(kw['keyword'])
+            if current and current_tokens + tokens > self.chunk_token_budget:
+                chunks.append(current)
+                current = []
+                current_tokens = 0
+            current.append(kw)
+            current_tokens += tokens
+        if current:
+            chunks.append(current)
+        return chunks
+    
+    @staticmethod
+    def _estimate_tokens(keyword: str) -> int:
+        """Rough token count of a keyword as a quoted JSON list entry (~4 chars per token)"""
+        return len(keyword) // 4 + 3
+    
+    def _categorize_chunk(self, keywords: List[Dict]) -> Dict[str, List[Dict]]:
+        """One LLM call for one chunk; raises on API or parse errors"""
         keyword_list = [kw['keyword'] for kw in keywords]
         
         prompt = f"""
@@ -83,36 +197,70 @@ class LLMHelper:
         }}
         """
         
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-                max_tokens=1000
-            )
-            
-            content = response.choices[0].message.content.strip()
+        def parse(content):
             start_idx = content.find('{')
             end_idx = content.rfind('}') + 1
             json_str = content[start_idx:end_idx]
             
-            categorized = json.loads(json_str)
-            
-            # Map back to full keyword objects
-            result = {}
-            for category, keyword_names in categorized.items():
-                result[category] = []
-                for kw_name in keyword_names:
-                    for kw_obj in keywords:
-                        if kw_obj['keyword'].lower() == kw_name.lower():
-                            result[category].append(kw_obj)
-                            break
-            
-            return result
-            
-        except Exception as e:
-            print(f"Error categorizing keywords: {e}")
-            return self._fallback_categorization(keywords)
+            return json.loads(json_str)
+        
+        categorized = self._complete(prompt, temperature=0.3, max_tokens=1000, parse=parse)
+        
+        # Map back to full keyword objects through a normalized-name index
+        index = {}
+        for kw_obj in keywords:
+            index.setdefault(self._normalize_name(kw_obj['keyword']), []).append(kw_obj)
+        
+        result = {}
+        assigned = set()
+        for category, keyword_names in categorized.items():
+            result[category] = []
+            for kw_name in keyword_names:
+                matches = index.get(self._normalize_name(kw_name), []) if isinstance(kw_name, str) else []
+                result[category].extend(matches)
+                assigned.update(id(kw_obj) for kw_obj in matches)
+        
+        # Keywords the LLM dropped are kept in a leftover bucket rather than lost
+        leftover = [kw_obj for kw_obj in keywords if id(kw_obj) not in assigned]
+        if leftover:
+            print(f"LLM left {len(leftover)} keywords uncategorized")
+            result.setdefault(LEFTOVER_CATEGORY, []).extend(leftover)
+        
+        return result
+    
+    def _complete(self, prompt: str, temperature: float, max_tokens: int, parse):
+        """Chat completion through the response cache; only responses that parse are cached"""
+        instrumentation = get_instrumentation()
+        if self.cache:
+            cached = self.cache.get_response(MODEL, temperature, prompt)
+            if cached is not None:
+                instrumentation.count('llm.cache_hits')
+                return parse(cached)
+        
+        if self.rate_limiter:
+            with instrumentation.timer('llm.rate_limit_wait'):
+                self.rate_limiter.wait()
+        instrumentation.count('llm.requests')
+        with instrumentation.timer('llm.request'):
+            response = self.client.chat.completions.create(
+                model=MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        if response.usage:
+            instrumentation.count('llm.prompt_tokens', response.usage.prompt_tokens)
+            instrumentation.count('llm.completion_tokens', response.usage.completion_tokens)
+        
+        content = response.choices[0].message.content.strip()
+        parsed = parse(content)
+        if self.cache:
+            self.cache.set_response(MODEL, temperature, prompt, content)
+        return parsed
+    
+    @staticmethod
+    def _normalize_name(keyword: str) -> str:
+        return ' '.join(keyword.lower().split())
     
     def _fallback_categorization(self, keywords: List[Dict]) -> Dict[str, List[Dict]]:
         """Simple rule-based categorization as fallback"""
@@ -124,15 +272,13 @@ class LLMHelper:
             'informational_terms': []
         }
         
-        location_words = ['near me', 'in', 'city', 'local', 'area']
-        info_words = ['how', 'what', 'best', 'top', 'review', 'guide', 'tips']
-        
         for kw in keywords:
-            keyword_lower = kw['keyword'].lower()
+            # Callers with a KeywordFrame pass the cached bitmask as '_rules'
+            rules = kw['_rules'] if '_rules' in kw else rule_mask(kw['keyword'])
             
-            if any(word in keyword_lower for word in info_words):
+            if RULES.has(rules, 'informational'):
                 categories['informational_terms'].append(kw)
-            elif any(word in keyword_lower for word in location_words):
+            elif RULES.has(rules, 'location_intent'):
                 categories['location_terms'].append(kw)
             else:
                 categories['category_terms'].append(kw)
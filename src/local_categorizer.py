@@ -0,0 +1,121 @@
+import zlib
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from src.keyword_frame import CATEGORIES
+from src.llm_cache import normalize_keyword
+
+# The five ad group types the LLM chooses between; leftovers are never learned
+TARGET_CATEGORIES = tuple(category for category in CATEGORIES if category != 'uncategorized_terms')
+
+
+class LocalCategorizer:
+    """Offline nearest-centroid categorizer over TF-IDF char n-gram vectors.
+
+    Keywords are padded with spaces and split into 3-5 character n-grams,
+    hashed (crc32, so stable across processes) into n_features buckets and
+    weighted by IDF from the training set. Each category's centroid is the
+    normalized mean of its training vectors. A prediction is confident when its
+    cosine similarity and its margin over the runner-up clear the thresholds;
+    everything else is left for the LLM.
+    """
+
+    def __init__(self, n_features: int = 2 ** 16, ngram_range: Tuple[int, int] = (3, 5),
+                 min_similarity: float = 0.35, min_margin: float = 0.08,
+                 min_examples: int = 5, min_training_size: int = 50):
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.min_examples = min_examples
+        self.min_training_size = min_training_size
+
+        self.categories = ()
+        self.idf = None
+        self.centroids = None  # (categories, n_features)
+
+    @classmethod
+    def from_llm_cache(cls, cache, model: str, **kwargs) -> 'LocalCategorizer':
+        """Train on the keyword categories an LLM has already answered"""
+        categorizer = cls(**kwargs)
+        categorizer.fit(cache.labeled_keywords(model))
+        return categorizer
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def _features(self, keyword: str) -> Dict[int, int]:
+        """Hashed n-gram counts"""
+        text = f" {normalize_keyword(keyword)} "
+        counts = {}
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for start in range(len(text) - n + 1):
+                bucket = zlib.crc32(text[start:start + n].encode('utf-8')) % self.n_features
+                counts[bucket] = counts.get(bucket, 0) + 1
+        return counts
+
+    def _vector(self, counts: Dict[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Sparse L2-normalized TF-IDF vector as (buckets, weights)"""
+        buckets = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        if self.idf is not None:
+            weights *= self.idf[buckets]
+        norm = np.linalg.norm(weights)
+        return buckets, (weights / norm if norm else weights)
+
+    def fit(self, labeled: Sequence[Tuple[str, str]]) -> 'LocalCategorizer':
+        """Build IDF weights and centroids; stays untrained if there is too little data"""
+        labeled = [(keyword, category) for keyword, category in labeled if category in TARGET_CATEGORIES]
+        per_category = {category: sum(1 for _, label in labeled if label == category)
+                        for category in TARGET_CATEGORIES}
+        categories = tuple(category for category, count in per_category.items() if count >= self.min_examples)
+        labeled = [(keyword, category) for keyword, category in labeled if category in categories]
+        if len(labeled) < self.min_training_size or len(categories) < 2:
+            self.categories, self.idf, self.centroids = (), None, None
+            print(f"Local categorizer: {len(labeled)} usable labels, not enough to train")
+            return self
+
+        features = [self._features(keyword) for keyword, _ in labeled]
+        document_frequency = np.zeros(self.n_features)
+        for counts in features:
+            document_frequency[list(counts)] += 1
+        self.idf = np.log((1 + len(labeled)) / (1 + document_frequency)) + 1
+
+        centroids = np.zeros((len(categories), self.n_features))
+        rows = {category: i for i, category in enumerate(categories)}
+        for (_, category), counts in zip(labeled, features):
+            buckets, weights = self._vector(counts)
+            centroids[rows[category], buckets] += weights
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        self.centroids = centroids / np.where(norms > 0, norms, 1)
+        self.categories = categories
+
+        print(f"Local categorizer trained on {len(labeled)} labeled keywords")
+        return self
+
+    def predict(self, keyword: str) -> Tuple[str, float, float]:
+        """(best category, cosine similarity, margin over the runner-up)"""
+        buckets, weights = self._vector(self._features(keyword))
+        similarities = self.centroids[:, buckets] @ weights
+        order = np.argsort(-similarities)
+        best = similarities[order[0]]
+        runner_up = similarities[order[1]] if len(order) > 1 else 0.0
+        return self.categories[order[0]], float(best), float(best - runner_up)
+
+    def categorize(self, keywords: List[Dict]) -> Tuple[Dict[str, List[Dict]], List[Dict]]:
+        """Split keyword records into confident local categories and the rest for the LLM"""
+        if not self.is_trained:
+            return {}, list(keywords)
+
+        categorized = {}
+        uncertain = []
+        for kw in keywords:
+            category, similarity, margin = self.predict(kw['keyword'])
+            if similarity >= self.min_similarity and margin >= self.min_margin:
+                categorized.setdefault(category, []).append(kw)
+            else:
+                uncertain.append(kw)
+        return categorized, uncertain
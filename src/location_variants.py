@@ -0,0 +1,100 @@
+from typing import Sequence
+
+import numpy as np
+
+from src.keyword_frame import COLUMNS, OPTIONAL_COLUMNS, KeywordFrame, _empty_column, _object_column, cast_column
+
+# Variant keyword templates, indexed by template id
+LOCATION_TEMPLATES = ('{keyword} {city}', '{keyword} in {city}', '{city} {keyword}')
+
+# Variants are estimated at a tenth of their base keyword's search volume
+VARIANT_VOLUME_FACTOR = 0.1
+
+
+class LocationVariants:
+    """Location variants of a keyword frame, kept as (base row, location, template) triples.
+
+    Metric columns are derived from the base rows when read and the keyword
+    strings are only built on export, so 50 locations cost three small ints per
+    variant instead of 150 full keyword copies. Stage outputs such as score or
+    category are set on the variants like frame columns.
+    """
+
+    def __init__(self, base: KeywordFrame, cities: Sequence[str], base_rows, location_ids, template_ids):
+        self.base = base
+        self.cities = tuple(cities)
+        self.base_rows = np.asarray(base_rows, dtype=np.int64)
+        self.location_ids = np.asarray(location_ids, dtype=np.int16)
+        self.template_ids = np.asarray(template_ids, dtype=np.int8)
+        self.columns = {}
+        self.present = set()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['present'] = sorted(self.present)  # Same bytes in every process, as KeywordFrame
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.present = set(self.present)
+
+    @classmethod
+    def expand(cls, base: KeywordFrame, cities: Sequence[str], rows) -> 'LocationVariants':
+        """Every city x template for each of the given base rows, in keyword, city, template order"""
+        rows = np.asarray(rows, dtype=np.int64)
+        per_city = len(LOCATION_TEMPLATES)
+        return cls(
+            base,
+            cities,
+            np.repeat(rows, len(cities) * per_city),
+            np.tile(np.repeat(np.arange(len(cities)), per_city), len(rows)),
+            np.tile(np.arange(per_city), len(rows) * len(cities))
+        )
+
+    def __len__(self) -> int:
+        return len(self.base_rows)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name in self.columns:
+            return self.columns[name]
+        if name == 'keyword':
+            return _object_column(self.keyword(i) for i in range(len(self)))
+        if name == 'is_location_variant':
+            return np.ones(len(self), dtype=np.bool_)
+        if name in OPTIONAL_COLUMNS:
+            return _empty_column(name, len(self))
+
+        column = self.base.columns[name][self.base_rows]
+        if name == 'avg_monthly_searches':
+            column = (column * VARIANT_VOLUME_FACTOR).astype(np.int64)  # Estimate lower volume
+        return column
+
+    def __repr__(self) -> str:
+        return f"LocationVariants({len(self)} variants of {len(np.unique(self.base_rows))} keywords)"
+
+    def keyword(self, i: int) -> str:
+        keyword = self.base.columns['keyword'][self.base_rows[i]]
+        city = self.cities[self.location_ids[i]]
+        return LOCATION_TEMPLATES[self.template_ids[i]].format(keyword=keyword, city=city)
+
+    def set_column(self, name: str, values) -> None:
+        self.columns[name] = cast_column(name, values, len(self))
+        if name in OPTIONAL_COLUMNS:
+            self.present.add(name)
+
+    def rebase(self, base: KeywordFrame, indices) -> 'LocationVariants':
+        """The same variants over base = self.base.take(indices); variants of dropped rows go too"""
+        positions = np.full(len(self.base), -1, dtype=np.int64)
+        positions[np.asarray(indices, dtype=np.int64)] = np.arange(len(indices))
+        base_rows = positions[self.base_rows]
+        keep = base_rows >= 0
+
+        variants = LocationVariants(base, self.cities, base_rows[keep], self.location_ids[keep],
+                                    self.template_ids[keep])
+        variants.columns = {name: column[keep] for name, column in self.columns.items()}
+        variants.present = set(self.present)
+        return variants
+
+    def to_frame(self) -> KeywordFrame:
+        """Expand into ordinary frame rows (builds every keyword string)"""
+        return KeywordFrame({name: self[name] for name in COLUMNS}, self.present)
@@ -0,0 +1,163 @@
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Sequence
+
+from src.checkpoint import CheckpointStore
+from src.instrumentation import get_instrumentation
+
+
+class Stage:
+    """One pipeline step: fn is called with the results of deps, in order.
+
+    config is the slice of the pipeline config the stage reads; it is part of the
+    stage's checkpoint key.
+    """
+
+    def __init__(self, name: str, fn: Callable, deps: Sequence[str] = (), config: Dict = None):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.config = config
+        self.started = None
+        self.finished = None
+        self.resumed = False
+
+    @property
+    def duration(self) -> float:
+        return self.finished - self.started if self.finished is not None else 0.0
+
+
+class StageDAG:
+    """Runs declared stages on a thread pool as soon as their inputs are ready.
+
+    Stages run in worker threads, so blocking work (run_sync on the shared event
+    loop, OpenAI calls, NumPy) from independent stages overlaps. The first stage
+    error stops scheduling and is re-raised once running stages finish.
+
+    With a CheckpointStore every stage output is saved, and with resume=True a
+    stage whose config slice and input digests match a checkpoint is loaded
+    instead of run.
+    """
+
+    def __init__(self, max_workers: int = 4, checkpoints: CheckpointStore = None, resume: bool = False):
+        self.max_workers = max_workers
+        self.checkpoints = checkpoints
+        self.resume = resume
+        self.stages = {}
+        self.results = {}
+        self.digests = {}
+        self.started = None
+        self.finished = None
+
+    def add(self, name: str, fn: Callable, deps: Sequence[str] = (), config: Dict = None) -> 'StageDAG':
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        self.stages[name] = Stage(name, fn, deps, config)
+        return self
+
+    def _check(self) -> None:
+        """Unknown dependencies and cycles fail before anything runs"""
+        for stage in self.stages.values():
+            missing = [dep for dep in stage.deps if dep not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages: {missing}")
+
+        visiting, done = set(), set()
+
+        def visit(name, path):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage cycle: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep, path + [name])
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name, [])
+
+    def run(self) -> Dict[str, Any]:
+        """Run every stage and return {stage name: result}"""
+        self._check()
+        self.results = {}
+        self.digests = {}
+        self.started = time.perf_counter()
+        pending = dict(self.stages)
+        running = {}
+        error = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='pipeline-stage') as executor:
+            while pending or running:
+                if error is None:
+                    ready = [stage for stage in pending.values()
+                             if all(dep in self.results for dep in stage.deps)]
+                    for stage in ready:
+                        del pending[stage.name]
+                        running[executor.submit(contextvars.copy_context().run, self._run_stage, stage)] = stage
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        self.results[stage.name] = future.result()
+                    except Exception as e:
+                        error = error or e
+
+        self.finished = time.perf_counter()
+        if error is not None:
+            raise error
+        return self.results
+
+    def _run_stage(self, stage: Stage):
+        stage.started = time.perf_counter()
+        try:
+            with get_instrumentation().stage(stage.name) as record:
+                if self.checkpoints is None:
+                    return stage.fn(*(self.results[dep] for dep in stage.deps))
+
+                key = self.checkpoints.key(stage.name, stage.config, [self.digests[dep] for dep in stage.deps])
+                checkpoint = self.checkpoints.load(key) if self.resume else None
+                if checkpoint is not None:
+                    result, self.digests[stage.name] = checkpoint
+                    stage.resumed = record['resumed'] = True
+                    print(f"⏩ Resumed {stage.name} from checkpoint")
+                    return result
+
+                result = stage.fn(*(self.results[dep] for dep in stage.deps))
+                self.digests[stage.name] = self.checkpoints.save(key, result)
+                return result
+        finally:
+            stage.finished = time.perf_counter()
+
+    def critical_path(self) -> List[Stage]:
+        """Chain of stages that determined the total run time, first to last"""
+        finished = [stage for stage in self.stages.values() if stage.finished is not None]
+        if not finished:
+            return []
+        path = [max(finished, key=lambda stage: stage.finished)]
+        while path[-1].deps:
+            # The dependency that finished last is the one the stage waited for
+            path.append(max((self.stages[dep] for dep in path[-1].deps), key=lambda stage: stage.finished))
+        return path[::-1]
+
+    def timings(self) -> Dict[str, Dict[str, float]]:
+        """Start offset and duration (seconds) per stage that ran"""
+        return {
+            stage.name: {'start': round(stage.started - self.started, 3), 'duration': round(stage.duration, 3)}
+            for stage in self.stages.values() if stage.finished is not None
+        }
+
+    def report(self) -> str:
+        total = (self.finished or time.perf_counter()) - self.started
+        path = self.critical_path()
+        lines = [f"Stage timings (total {total:.2f}s):"]
+        for name, timing in sorted(self.timings().items(), key=lambda item: item[1]['start']):
+            resumed = '  (checkpoint)' if self.stages[name].resumed else ''
+            lines.append(f"  {name:<22} +{timing['start']:>6.2f}s  {timing['duration']:>6.2f}s{resumed}")
+        lines.append("Critical path: " + " -> ".join(f"{stage.name} ({stage.duration:.2f}s)" for stage in path))
+        return '\n'.join(lines)
@@ -0,0 +1,195 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple, TypeVar
+
+T = TypeVar('T')
+
+# Leaf frames in these stdlib modules are threads parked on a lock, queue or
+# selector; they are dropped so the profile shows where CPU time goes
+_IDLE_MODULES = ('threading.py', 'selectors.py', 'queue.py', os.path.join('concurrent', 'futures', 'thread.py'))
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples every thread's Python stack with sys._current_frames().
+
+    A daemon thread wakes every interval seconds, so overhead is independent of
+    how many calls the pipeline makes and all threads (DAG stages, the shared
+    event loop, categorization workers) are covered. Output is collapsed stacks
+    ("root;caller;leaf count") for flamegraph.pl / speedscope, and a hot
+    function table by self and total samples.
+    """
+
+    def __init__(self, interval: float = 0.005, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if not self.include_idle and frame.f_code.co_filename.endswith(_IDLE_MODULES):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed stack format, one stack per line"""
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, n: int = 25) -> List[Tuple[str, int, int]]:
+        """(function, self samples, total samples) for the n functions with the most self samples"""
+        own = Counter()
+        total = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for label in set(stack):
+                total[label] += count
+        return [(label, own[label], total[label]) for label, _ in own.most_common(n)]
+
+    def top_table(self, n: int = 25) -> str:
+        sampled = sum(self.stacks.values()) or 1
+        lines = [f"Top {n} functions by self time ({sampled} stack samples every {self.interval * 1000:.0f}ms)",
+                 f"{'self %':>7} {'total %':>8}  function"]
+        for label, own, total in self.top(n):
+            lines.append(f"{own / sampled:>7.1%} {total / sampled:>8.1%}  {label}")
+        return '\n'.join(lines)
+
+
+def _is_idle(filename: str) -> bool:
+    return filename.endswith(_IDLE_MODULES)
+
+
+def _busy_stats(stats: pstats.Stats) -> pstats.Stats:
+    """stats without idle waiting: functions in _IDLE_MODULES, and the time built-ins
+    (lock.acquire, SimpleQueue.get, epoll.poll) spend when called from them"""
+    busy = pstats.Stats()
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        if _is_idle(func[0]):
+            continue
+        idle_callers = {caller: timing for caller, timing in callers.items() if _is_idle(caller[0])}
+        if idle_callers:
+            if len(idle_callers) == len(callers):
+                continue
+            cc -= sum(timing[0] for timing in idle_callers.values())
+            nc -= sum(timing[1] for timing in idle_callers.values())
+            tt -= sum(timing[2] for timing in idle_callers.values())
+            ct -= sum(timing[3] for timing in idle_callers.values())
+            callers = {caller: timing for caller, timing in callers.items() if caller not in idle_callers}
+        busy.stats[func] = (cc, nc, tt, ct, callers)
+        busy.total_calls += nc
+        busy.prim_calls += cc
+        busy.total_tt += tt
+    return busy
+
+
+# From 3.12 cProfile hooks sys.monitoring, which is per interpreter: one profiler
+# already sees every thread, and enabling a second raises ValueError
+_PROFILE_PER_THREAD = sys.version_info < (3, 12)
+
+
+class ThreadedProfile:
+    """cProfile for every thread, not just the one that called enable().
+
+    Before Python 3.12, threading.setprofile() installs a hook in each thread
+    started afterwards; its first call swaps in a fresh cProfile.Profile for
+    that thread, and the per-thread stats are merged on stop(). From 3.12 a
+    single profiler covers every thread. top_table() leaves out threads parked
+    on locks, queues and selectors, as SamplingProfiler does.
+    """
+
+    def __init__(self):
+        self.profiles = []
+        self._lock = threading.Lock()
+        self.stats = None
+
+    def _start_thread(self, frame, event, arg) -> None:
+        profile = cProfile.Profile()
+        with self._lock:
+            self.profiles.append(profile)
+        profile.enable()  # Replaces this hook for the calling thread
+
+    def start(self) -> None:
+        if _PROFILE_PER_THREAD:
+            threading.setprofile(self._start_thread)
+        self._start_thread(None, None, None)
+
+    def stop(self) -> pstats.Stats:
+        if _PROFILE_PER_THREAD:
+            threading.setprofile(None)
+        with self._lock:
+            profiles = list(self.profiles)
+        profiles[0].disable()  # The caller's own; other threads have finished or sit idle
+        self.stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            self.stats.add(profile)
+        return self.stats
+
+    def top_table(self, n: int = 25) -> str:
+        stream = io.StringIO()
+        busy = _busy_stats(self.stats)
+        busy.stream = stream
+        busy.sort_stats('tottime').print_stats(n)
+        return stream.getvalue()
+
+
+def profile_call(fn: Callable[[], T], output_dir: str, mode: str = 'sampling', top: int = 25) -> Tuple[T, Dict]:
+    """Run fn under a profiler and write its outputs to output_dir.
+
+    mode 'sampling' writes profile.collapsed (flamegraph input) and
+    profile_top.txt; 'cprofile' writes profile.pstats and profile_top.txt.
+    Returns fn's result and {output name: path}.
+    """
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    profiler = SamplingProfiler() if mode == 'sampling' else ThreadedProfile()
+
+    started = time.perf_counter()
+    profiler.start()
+    try:
+        result = fn()
+    finally:
+        profiler.stop()
+    elapsed = time.perf_counter() - started
+
+    paths = {'top': output / 'profile_top.txt'}
+    if mode == 'sampling':
+        paths['collapsed'] = output / 'profile.collapsed'
+        paths['collapsed'].write_text(profiler.collapsed(), encoding='utf-8')
+    else:
+        paths['pstats'] = output / 'profile.pstats'
+        profiler.stats.dump_stats(paths['pstats'])
+    table = f"Profiled run: {elapsed:.2f}s ({mode})\n\n{profiler.top_table(top)}"
+    paths['top'].write_text(table, encoding='utf-8')
+
+    print(f"\n{table}")
+    return result, {name: str(path) for name, path in paths.items()}
@@ -0,0 +1,211 @@
+import ast
+import hashlib
+import json
+import random
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from src.keyword_rules import RULES, rule_mask
+
+DEFAULT_FIXTURES_DIR = './fixtures/replay'
+
+# Building blocks for synthetic pages and autocomplete suggestions
+_PRODUCTS = ['shirts', 'shoes', 'jeans', 'jackets', 'dresses', 'watches', 'bags', 'sneakers',
+             'kurtas', 'sarees', 't shirts', 'sunglasses', 'wallets', 'belts', 'sandals', 'hoodies']
+_MODIFIERS = ['online', 'for men', 'for women', 'price', 'sale', 'near me', 'best', 'cheap',
+              'brands', 'how to choose', 'vs', 'reviews', 'delivery', 'discount', 'size guide']
+_WORDS = ['premium', 'cotton', 'casual', 'formal', 'festive', 'collection', 'new', 'arrivals',
+          'trending', 'style', 'comfort', 'fit', 'quality', 'exclusive', 'offers', 'free', 'returns']
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256('\x00'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _rng(*parts: str) -> random.Random:
+    """Random generator seeded by the request, so synthetic responses never change"""
+    return random.Random(int(_digest(*parts)[:16], 16))
+
+
+class ReplayTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """httpx transport serving SerpAPI, OpenAI and web pages from local fixtures.
+
+    Requests are keyed by method, URL (minus the api_key) and body. A recorded
+    fixture (<fixtures_dir>/<kind>/<key>.json) is served when one exists;
+    otherwise a synthetic response is generated from the request alone, so
+    replayed runs are reproducible with no network at all. With record=True
+    requests go to the network instead and every response is saved as a
+    fixture.
+    """
+
+    def __init__(self, fixtures_dir: str = DEFAULT_FIXTURES_DIR, record: bool = False):
+        self.root = Path(fixtures_dir)
+        self.record = record
+        self.stats = {'recorded': 0, 'replayed': 0, 'synthetic': 0}
+        if record:
+            self._network = httpx.HTTPTransport()
+            self._async_network = httpx.AsyncHTTPTransport()
+
+    @staticmethod
+    def _kind(request: httpx.Request) -> str:
+        if request.url.host.endswith('serpapi.com'):
+            return 'serp'
+        if request.url.path.endswith('/chat/completions'):
+            return 'llm'
+        return 'page'
+
+    def _fixture_path(self, request: httpx.Request) -> Path:
+        params = sorted((key, value) for key, value in request.url.params.multi_items() if key != 'api_key')
+        url = f"{request.url.scheme}://{request.url.host}{request.url.path}?{params}"
+        key = _digest(request.method, url, request.content.decode('utf-8', 'replace'))
+        return self.root / self._kind(request) / f"{key}.json"
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        if self.record:
+            response = self._network.handle_request(request)
+            response.read()
+            return self._save(request, response)
+        return self._replay(request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        if self.record:
+            response = await self._async_network.handle_async_request(request)
+            await response.aread()
+            return self._save(request, response)
+        return self._replay(request)
+
+    def _save(self, request: httpx.Request, response: httpx.Response) -> httpx.Response:
+        path = self._fixture_path(request)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fixture = {
+            'request': {'method': request.method, 'url': str(request.url.copy_remove_param('api_key'))},
+            'status': response.status_code,
+            'content_type': response.headers.get('content-type', ''),
+            'body': response.content.decode('utf-8', 'replace')
+        }
+        path.write_text(json.dumps(fixture, indent=2), encoding='utf-8')
+        self.stats['recorded'] += 1
+        return httpx.Response(response.status_code, headers={'content-type': fixture['content_type']},
+                              content=response.content, request=request)
+
+    def _replay(self, request: httpx.Request) -> httpx.Response:
+        path = self._fixture_path(request)
+        if path.exists():
+            fixture = json.loads(path.read_text(encoding='utf-8'))
+            self.stats['replayed'] += 1
+            return httpx.Response(fixture['status'], headers={'content-type': fixture['content_type']},
+                                  content=fixture['body'].encode('utf-8'), request=request)
+
+        self.stats['synthetic'] += 1
+        kind = self._kind(request)
+        if kind == 'serp':
+            return httpx.Response(200, json=self._synthetic_serp(dict(request.url.params)), request=request)
+        if kind == 'llm':
+            return httpx.Response(200, json=self._synthetic_completion(json.loads(request.content)), request=request)
+        return self._synthetic_page(request)
+
+    @staticmethod
+    def _synthetic_serp(params: Dict) -> Dict:
+        query = params.get('q', '')
+        rng = _rng('serp', params.get('engine', ''), query)
+        if params.get('engine') == 'google_autocomplete':
+            suggestions = [f"{query} {modifier}" for modifier in rng.sample(_MODIFIERS, 8)]
+            suggestions += [f"{query} {product}" for product in rng.sample(_PRODUCTS, 4)]
+            return {'suggestions': [{'value': suggestion} for suggestion in suggestions]}
+
+        results = {'search_information': {'total_results': rng.randrange(10_000, 500_000_000)}}
+        if query.startswith('site:'):
+            results['organic_results'] = [
+                {'title': f"{' '.join(rng.sample(_WORDS, 2)).title()} {product.title()} Online",
+                 'snippet': f"Shop {product} {rng.choice(_MODIFIERS)} with {' '.join(rng.sample(_WORDS, 3))}"}
+                for product in rng.sample(_PRODUCTS, 10)
+            ]
+        return results
+
+    @staticmethod
+    def _synthetic_completion(body: Dict) -> Dict:
+        prompt = body['messages'][-1]['content']
+        if 'Keywords to categorize:' in prompt:
+            content = json.dumps(_categorize(_literal_after(prompt, 'Keywords to categorize:') or []))
+        else:
+            terms = (_literal_after(prompt, 'Navigation:') or []) + (_literal_after(prompt, 'Main Headings:') or [])
+            rng = _rng('seeds', prompt)
+            seeds = [term.lower() for term in terms if isinstance(term, str) and term.strip()][:10]
+            extra = rng.sample(_PRODUCTS, min(len(_PRODUCTS), 20 - len(seeds)))
+            seeds += [f"{product} {rng.choice(_MODIFIERS)}" for product in extra]
+            content = json.dumps(seeds)
+
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        return {
+            'id': f"chatcmpl-replay-{_digest(prompt)[:12]}",
+            'object': 'chat.completion',
+            'created': 0,
+            'model': body.get('model', ''),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens}
+        }
+
+    @staticmethod
+    def _synthetic_page(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path == '/robots.txt':
+            return httpx.Response(404, request=request)
+
+        base = f"{request.url.scheme}://{request.url.host}"
+        rng = _rng('page', request.url.host, path)
+        if path == '/sitemap.xml':
+            urls = ''.join(f"<url><loc>{base}/category/{product.replace(' ', '-')}</loc></url>"
+                           for product in _PRODUCTS)
+            return httpx.Response(200, headers={'content-type': 'application/xml'}, request=request,
+                                  content=f'<?xml version="1.0"?><urlset>{urls}</urlset>'.encode('utf-8'))
+
+        title = path.strip('/').split('/')[-1].replace('-', ' ') or urlparse(base).netloc.split('.')[0]
+        nav = ''.join(f"<li><a href='/category/{product.replace(' ', '-')}'>{product.title()}</a></li>"
+                      for product in rng.sample(_PRODUCTS, 8))
+        sections = ''.join(
+            f"<section><h2>{product.title()} {rng.choice(_MODIFIERS)}</h2>"
+            + ''.join(f"<p>{' '.join(rng.choices(_WORDS + _PRODUCTS, k=40))}.</p>" for _ in range(5))
+            + "</section>"
+            for product in rng.sample(_PRODUCTS, 6)
+        )
+        html = (f"<html><head><title>{title.title()} | Online Store</title>"
+                f"<meta name='description' content='Shop {title} online'></head>"
+                f"<body><nav><ul>{nav}</ul></nav><main><h1>{title.title()}</h1>{sections}</main></body></html>")
+        return httpx.Response(200, headers={'content-type': 'text/html; charset=utf-8'},
+                              content=html.encode('utf-8'), request=request)
+
+
+def _literal_after(prompt: str, label: str) -> Optional[List]:
+    """The Python list literal following label in a prompt (prompts embed lists with repr)"""
+    match = re.search(re.escape(label) + r'\s*(\[.*?\])\s*$', prompt, re.MULTILINE | re.DOTALL)
+    if not match:
+        return None
+    try:
+        value = ast.literal_eval(match.group(1))
+    except (ValueError, SyntaxError):
+        return None
+    return value if isinstance(value, list) else None
+
+
+def _categorize(keywords: List[str]) -> Dict[str, List[str]]:
+    """Rule-based stand-in for the LLM's categorization answer"""
+    categories = {'category_terms': [], 'competitor_terms': [], 'location_terms': [], 'informational_terms': []}
+    for keyword in keywords:
+        rules = rule_mask(keyword)
+        if RULES.has(rules, 'informational'):
+            categories['informational_terms'].append(keyword)
+        elif RULES.has(rules, 'location_intent'):
+            categories['location_terms'].append(keyword)
+        elif RULES.has(rules, 'comparison'):
+            categories['competitor_terms'].append(keyword)
+        else:
+            categories['category_terms'].append(keyword)
+    return categories
@@ -1,71 +1,130 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import httpx
 from urllib.parse import urljoin, urlparse
 import time
 from typing import Dict, List
 import logging
+import os
+
+from src.async_utils import off_loop, run_sync
+from src.client_pool import http_transport, shared
+from src.html_extractor import ContentExtractor, extract_content
+from src.http_cache import HTTPCache
+from src.instrumentation import get_instrumentation
 
 class WebsiteScraper:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
+    def __init__(self, max_connections_per_host: int = 2, max_connections: int = 50, timeout: float = 10,
+                 parser_backend: str = None, cache_dir: str = None, stream: bool = False,
+                 max_bytes: int = 2_000_000, stream_text_chars: int = 6000):
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        }
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.parser_backend = parser_backend  # None picks lxml when installed, else html.parser
+        self.cache = shared(('http_cache', os.path.abspath(cache_dir)), lambda: HTTPCache(cache_dir)) if cache_dir else None
+        # Streaming mode stops downloading at max_bytes, or earlier once the head,
+        # the navigation, an h1 and stream_text_chars of body text have been parsed
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.stream_text_chars = stream_text_chars
+        self._client = None
+        self._client_loop = None
+        self._host_limits = {}
     
     def scrape_website(self, url: str) -> Dict:
         """Extract content from website"""
+        return self.scrape_many([url])[0]
+    
+    def scrape_many(self, urls: List[str]) -> List[Dict]:
+        """Scrape several websites concurrently, results in the same order as urls"""
+        return run_sync(self.ascrape_many(urls))
+    
+    async def ascrape_many(self, urls: List[str]) -> List[Dict]:
+        """Async version of scrape_many - total time tracks the slowest site"""
+        return await asyncio.gather(*(self._scrape_one(url) for url in urls))
+    
+    async def afetch(self, url: str) -> bytes:
+        """Download a raw resource (sitemaps, robots.txt) under the same per-host limits"""
+        client = self._get_client()
+        async with self._host_limit(url):
+            response = await client.get(url)
+        response.raise_for_status()
+        return response.content
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """HTTP client for the running loop, shared process-wide so keep-alive connections outlive this scraper"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = shared(
+                ('scraper_http', loop, self.timeout, self.max_connections),
+                lambda: httpx.AsyncClient(
+                    headers=self.headers,
+                    timeout=self.timeout,
+                    follow_redirects=True,
+                    limits=httpx.Limits(max_connections=self.max_connections),
+                    transport=http_transport()
+                )
+            )
+            self._client_loop = loop
+            # Shared like the client, so the cap holds across every scraper using it
+            self._host_limits = shared(('scraper_host_limits', loop, self.max_connections_per_host), dict)
+        return self._client
+    
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        """Per-host semaphore so one site never gets more than max_connections_per_host requests
+        from this process, however many pipelines are scraping it"""
+        host = urlparse(url).netloc.lower()
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.max_connections_per_host)
+        return self._host_limits[host]
+    
+    async def _scrape_one(self, url: str) -> Dict:
+        """Fetch and parse a single page"""
+        instrumentation = get_instrumentation()
         try:
-            response = self.session.get(url, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extract key content
-            title = soup.find('title').get_text() if soup.find('title') else ""
-            
-            # Get meta description
-            meta_desc = ""
-            meta_tag = soup.find('meta', attrs={'name': 'description'})
-            if meta_tag:
-                meta_desc = meta_tag.get('content', '')
-            
-            # Extract headings
-            headings = {
-                'h1': [h.get_text().strip() for h in soup.find_all('h1')],
-                'h2': [h.get_text().strip() for h in soup.find_all('h2')],
-                'h3': [h.get_text().strip() for h in soup.find_all('h3')]
-            }
-            
-            # Extract navigation and menu items
-            nav_items = []
-            nav_elements = soup.find_all(['nav', 'menu'])
-            for nav in nav_elements:
-                links = nav.find_all('a')
-                nav_items.extend([link.get_text().strip() for link in links if link.get_text().strip()])
+            client = self._get_client()
+            # The HTTP cache reads and writes SQLite and body files, so it runs off the shared loop
+            headers = await off_loop(self.cache.conditional_headers, url) if self.cache else {}
+            not_modified = False
+            async with self._host_limit(url):
+                instrumentation.count('http.requests')
+                with instrumentation.timer('http.fetch'):
+                    async with client.stream('GET', url, headers=headers) as response:
+                        if self.cache and response.status_code == 304:
+                            instrumentation.count('http.not_modified')
+                            not_modified = True
+                        elif self.stream:
+                            html, extracted, length_ratio = await self._read_bounded(response)
+                        else:
+                            html, extracted, length_ratio = await response.aread(), None, None
             
-            # Extract main content
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
+            if not_modified:
+                # Unchanged since last run - serve the stored body
+                entry = await off_loop(self.cache.get_entry, url)
+                return await off_loop(self._parse_cached, url, entry)
             
-            # Get text content
-            main_content = soup.get_text()
+            if html is None:
+                # Cut short - nothing complete to cache
+                instrumentation.count('http.truncated')
+                return self._build_result(url, extracted, truncated=True, length_ratio=length_ratio)
             
-            # Clean up text
-            lines = (line.strip() for line in main_content.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
+            if self.cache and response.status_code == 200:
+                entry = await off_loop(self.cache.store, url, html, response.headers, response.charset_encoding)
+                if extracted is not None:
+                    result = self._build_result(url, extracted)
+                    await off_loop(self.cache.store_parsed, entry['content_hash'], result)
+                    return result
+                return await off_loop(self._parse_cached, url, entry, html)
             
-            return {
-                'url': url,
-                'title': title,
-                'meta_description': meta_desc,
-                'headings': headings,
-                'navigation': nav_items,
-                'content': text[:5000],  # Limit content for LLM processing
-                'content_length': len(text)
-            }
+            if extracted is not None:
+                return self._build_result(url, extracted)
+            return await off_loop(self._parse_html, url, html, response.charset_encoding)
             
         except Exception as e:
             logging.error(f"Error scraping {url}: {e}")
+            instrumentation.count('http.errors')
             return {
                 'url': url,
                 'error': str(e),
@@ -73,6 +132,71 @@ class WebsiteScraper:
                 'content': ''
             }
     
+    async def _read_bounded(self, response: httpx.Response):
+        """Stream the body into an incremental parser, stopping once enough is collected.
+        
+        Returns (body, extracted, length_ratio). body is None when the download was cut
+        short; length_ratio then estimates total size / bytes read (None if unknown).
+        """
+        extractor = ContentExtractor(backend=self.parser_backend, encoding=response.charset_encoding)
+        chunks = []
+        bytes_read = 0
+        
+        async for chunk in response.aiter_bytes():
+            extractor.feed(chunk)
+            chunks.append(chunk)
+            bytes_read += len(chunk)
+            if bytes_read >= self.max_bytes or extractor.has_enough(self.stream_text_chars):
+                total_bytes = int(response.headers.get('content-length') or 0)
+                downloaded = response.num_bytes_downloaded
+                if total_bytes and downloaded >= total_bytes:
+                    break  # That was the last chunk anyway
+                length_ratio = total_bytes / downloaded if total_bytes and downloaded else None
+                return None, extractor.close(), length_ratio
+        
+        return b''.join(chunks), extractor.close(), None
+    
+    def _parse_cached(self, url: str, entry: Dict, html: bytes = None) -> Dict:
+        """Parse a cached body (read from disk when html is None), reusing the stored
+        result for identical content"""
+        if html is None:
+            html = self.cache.load_body(entry)
+        parsed = self.cache.get_parsed(entry['content_hash'])
+        if parsed is None:
+            parsed = self._parse_html(url, html, entry['encoding'])
+            self.cache.store_parsed(entry['content_hash'], parsed)
+        return {**parsed, 'url': url}
+    
+    def _parse_html(self, url: str, html: bytes, encoding: str = None) -> Dict:
+        """Extract content from a downloaded page in a single traversal"""
+        with get_instrumentation().timer('html.parse'):
+            extracted = extract_content(html, backend=self.parser_backend, encoding=encoding)
+        return self._build_result(url, extracted)
+    
+    def _build_result(self, url: str, extracted: Dict, truncated: bool = False,
+                      length_ratio: float = None) -> Dict:
+        """Shape extracted fields into the scrape result dict"""
+        text = extracted['text']
+        
+        result = {
+            'url': url,
+            'title': extracted['title'],
+            'meta_description': extracted['meta_description'],
+            'headings': extracted['headings'],
+            'navigation': extracted['navigation'],
+            'nav_links': extracted['nav_links'],
+            'links': extracted['links'],
+            'content': text[:5000],  # Limit content for LLM processing
+            'content_length': len(text)
+        }
+        
+        if truncated:
+            # Only part of the page was read; scale by bytes when the total size is known
+            if length_ratio:
+                result['content_length'] = int(len(text) * length_ratio)
+            result['content_length_estimated'] = True
+        return result
+    
     def extract_products_services(self, content_data: Dict) -> List[str]:
         """Extract product/service keywords from scraped content"""
         products_services = []
@@ -92,4 +216,4 @@ class WebsiteScraper:
             if len(item) > 2 and len(item) < 50:  # Reasonable length
                 cleaned.append(item.lower().strip())
         
-        return list(set(cleaned))  # Remove duplicates
+        return list(dict.fromkeys(cleaned))  # Remove duplicates, keeping page order
@@ -0,0 +1,235 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Seconds a cached response stays fresh, per SerpAPI engine
+DEFAULT_TTLS = {
+    'google': 24 * 3600,                     # SERP counts drift, keep it short
+    'google_autocomplete': 30 * 24 * 3600    # Suggestions barely move
+}
+DEFAULT_TTL = 24 * 3600
+DEFAULT_DB_PATH = './data/cache/serp_cache.sqlite3'
+
+# Transport-only params that never change the response
+IGNORED_PARAMS = ('api_key', 'output', 'source')
+
+
+def canonical_params(params: Dict) -> Dict:
+    """Params with credentials dropped and query/location whitespace and case normalized"""
+    canonical = {}
+    for key, value in params.items():
+        if key in IGNORED_PARAMS or value is None:
+            continue
+        value = str(value)
+        if key in ('q', 'location'):
+            value = ' '.join(value.lower().split())
+        canonical[key] = value
+    return canonical
+
+
+def cache_key(params: Dict) -> str:
+    """Stable hash of the canonical params"""
+    payload = json.dumps(canonical_params(params), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SERPCache:
+    """SQLite store of SerpAPI responses with a TTL per engine"""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, ttl_by_engine: Dict[str, int] = None,
+                 default_ttl: int = DEFAULT_TTL):
+        self.path = path
+        self.ttl_by_engine = {**DEFAULT_TTLS, **(ttl_by_engine or {})}
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS serp_responses (
+                key TEXT PRIMARY KEY,
+                engine TEXT NOT NULL,
+                params TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_serp_engine ON serp_responses (engine, created_at)")
+        self._conn.commit()
+
+    def ttl_for(self, engine: str) -> int:
+        return self.ttl_by_engine.get(engine, self.default_ttl)
+
+    def get(self, params: Dict) -> Optional[Dict]:
+        """Fresh cached response for these params, or None"""
+        engine = params.get('engine', 'google')
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM serp_responses WHERE key = ?", (cache_key(params),)
+            ).fetchone()
+
+        if row is None or time.time() - row[1] > self.ttl_for(engine):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, params: Dict, response: Dict) -> None:
+        canonical = canonical_params(params)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO serp_responses (key, engine, params, response, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (cache_key(params), canonical.get('engine', 'google'), json.dumps(canonical, sort_keys=True),
+                 json.dumps(response), time.time())
+            )
+            self._conn.commit()
+
+    def purge(self, engine: str = None, expired_only: bool = False) -> int:
+        """Delete entries, optionally only for one engine and/or only expired ones"""
+        with self._lock:
+            engines = [engine] if engine else [
+                row[0] for row in self._conn.execute("SELECT DISTINCT engine FROM serp_responses")
+            ]
+            deleted = 0
+            for name in engines:
+                query = "DELETE FROM serp_responses WHERE engine = ?"
+                args = [name]
+                if expired_only:
+                    query += " AND created_at < ?"
+                    args.append(time.time() - self.ttl_for(name))
+                deleted += self._conn.execute(query, args).rowcount
+            self._conn.commit()
+        return deleted
+
+    def iter_search_totals(self, batch_size: int = 50000) -> Iterator[List[Tuple[str, str, int]]]:
+        """(query, location, total_results) of every cached google keyword search, in batches.
+        
+        Fields are pulled out with SQLite's JSON functions, so response bodies are never
+        parsed in Python, and pages are keyed on rowid so the lock is only held per batch.
+        site: queries (competitor page lookups) count a domain's pages, not keyword
+        demand, so they are left out.
+        """
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, json_extract(params, '$.q'), json_extract(params, '$.location'), "
+                    "json_extract(response, '$.search_information.total_results') "
+                    "FROM serp_responses WHERE engine = 'google' AND rowid > ? "
+                    "AND json_extract(params, '$.q') NOT LIKE 'site:%' ORDER BY rowid LIMIT ?",
+                    (last_rowid, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            yield [(query, location, int(total or 0)) for _, query, location, total in rows if query]
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            per_engine = dict(self._conn.execute(
+                "SELECT engine, COUNT(*) FROM serp_responses GROUP BY engine"
+            ).fetchall())
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'entries': per_engine
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def reestimate_metrics(cache: SERPCache, output: str = None, batch_size: int = 50000) -> int:
+    """Re-run the metric heuristics over the cached SERP results, one vectorized batch at a time"""
+    from src.keyword_frame import COMPETITION_LEVELS
+    from src.keyword_research import SERPKeywordResearcher
+
+    columns = ('avg_monthly_searches', 'competition', 'competition_score', 'top_of_page_bid_low',
+               'top_of_page_bid_high', 'total_results')
+    f = open(output, 'w', newline='', encoding='utf-8') if output else sys.stdout
+    written = 0
+    try:
+        writer = csv.writer(f)
+        writer.writerow(('keyword', 'location') + columns)
+        for batch in cache.iter_search_totals(batch_size):
+            keywords = [query for query, _, _ in batch]
+            metrics = SERPKeywordResearcher.estimate_metrics_batch(keywords, [total for _, _, total in batch])
+            metrics['competition'] = [COMPETITION_LEVELS[code] for code in metrics['competition']]
+            writer.writerows(zip(
+                keywords, [location for _, location, _ in batch], *(metrics[name] for name in columns)
+            ))
+            written += len(batch)
+    finally:
+        if output:
+            f.close()
+    print(f"Re-estimated metrics for {written} cached searches", file=sys.stderr)
+    return written
+
+
+def main(argv=None):
+    """CLI: python -m src.serp_cache {stats,purge,warm,reestimate}"""
+    parser = argparse.ArgumentParser(prog='python -m src.serp_cache', description="Manage the SERP response cache")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Cache database path")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('stats', help="Show entry counts per engine")
+
+    purge = commands.add_parser('purge', help="Delete cached responses")
+    purge.add_argument('--engine', help="Only purge this engine (e.g. google, google_autocomplete)")
+    purge.add_argument('--expired', action='store_true', help="Only purge entries past their TTL")
+
+    warm = commands.add_parser('warm', help="Fetch and cache metrics for a list of keywords")
+    warm.add_argument('keywords_file', help="Text file with one keyword per line")
+    warm.add_argument('--location', default='India')
+    warm.add_argument('--autocomplete', action='store_true',
+                      help="Treat lines as seeds and also cache their autocomplete suggestions")
+
+    reestimate = commands.add_parser('reestimate',
+                                     help="Recompute keyword metrics from every cached google search")
+    reestimate.add_argument('--output', help="CSV file to write (default: stdout)")
+    reestimate.add_argument('--batch-size', type=int, default=50000)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'warm':
+        from src.keyword_research import SERPKeywordResearcher
+
+        with open(args.keywords_file, 'r', encoding='utf-8') as f:
+            keywords = [line.strip() for line in f if line.strip()]
+        researcher = SERPKeywordResearcher(cache_path=args.db)
+        if args.autocomplete:
+            researcher.get_keyword_ideas(keywords, args.location)
+        else:
+            researcher._get_keyword_metrics_parallel(keywords, args.location)
+        print(json.dumps(researcher.cache.stats(), indent=2))
+        return
+
+    cache = SERPCache(args.db)
+    if args.command == 'reestimate':
+        reestimate_metrics(cache, args.output, args.batch_size)
+    elif args.command == 'stats':
+        print(json.dumps(cache.stats()['entries'], indent=2))
+    elif args.command == 'purge':
+        deleted = cache.purge(engine=args.engine, expired_only=args.expired)
+        print(f"Purged {deleted} cached responses")
+    cache.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from src.client_pool import http_transport
+from src.instrumentation import get_instrumentation
+
+SERP_API_URL = "https://serpapi.com/search"
+
+
+class SERPAPIError(Exception):
+    """SerpAPI returned an error payload or status"""
+
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def retryable(self) -> bool:
+        """Throttling and server errors are worth retrying; bad params or keys are not"""
+        return self.status_code is not None and (self.status_code == 429 or self.status_code >= 500)
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, SERPAPIError):
+        return error.retryable
+    return isinstance(error, httpx.TransportError)  # Timeouts and connection failures
+
+
+class TokenBucket:
+    """Token-bucket rate limiter shared by every coroutine and thread in the process.
+
+    acquire() reserves a token immediately (the balance may go negative) and then
+    sleeps until that token would have been refilled, so waiters are served in order.
+    """
+
+    def __init__(self, rate: float, capacity: int = None):
+        self.rate = rate
+        self.capacity = capacity or max(int(rate), 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take one token and return how long the caller must wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self) -> None:
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def wait(self) -> None:
+        """Blocking acquire() for worker threads outside the event loop"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class ProcessTokenBucket(TokenBucket):
+    """TokenBucket whose balance lives in shared memory, so one quota spans a process pool.
+
+    Create it in the parent and hand it to workers through the pool initializer;
+    time.monotonic() is system-wide, so every process refills against the same clock.
+    """
+
+    def __init__(self, rate: float, capacity: int = None, context=None):
+        super().__init__(rate, capacity)
+        context = context or multiprocessing.get_context()
+        self._state = context.Array('d', [float(self.capacity), time.monotonic()])  # tokens, updated
+
+    def _reserve(self) -> float:
+        with self._state.get_lock():
+            now = time.monotonic()
+            tokens, updated = self._state[:]
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate) - 1
+            self._state[:] = [tokens, now]
+            return 0.0 if tokens >= 0 else -tokens / self.rate
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']  # Unused here; threading locks don't pickle
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one in-flight call.
+
+    Must be used from a single event loop (the shared one in src.async_utils).
+    """
+
+    def __init__(self):
+        self._inflight = {}  # key -> (task, number of callers awaiting it)
+        self.saved_calls = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        entry = self._inflight.get(key)
+        if entry is not None:
+            self.saved_calls += 1
+            get_instrumentation().count('serp.coalesced')
+            task = entry[0]
+        else:
+            # The call runs as its own task so cancelling whichever caller started it
+            # doesn't cancel it for the others; it is only cancelled once nobody waits
+            task = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finished(key, done))
+        self._inflight[key] = (task, self._inflight.get(key, (task, 0))[1] + 1)
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._leave(key, task)
+
+    def _leave(self, key: str, task: asyncio.Future) -> None:
+        entry = self._inflight.get(key)
+        if entry is None or entry[0] is not task:
+            return
+        waiters = entry[1] - 1
+        if waiters:
+            self._inflight[key] = (task, waiters)
+            return
+        del self._inflight[key]
+        task.cancel()  # No-op once it has finished
+
+    def _finished(self, key: str, task: asyncio.Future) -> None:
+        entry = self._inflight.get(key)
+        if entry is not None and entry[0] is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Waiters re-raise it; don't warn when there are none
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limit on requests in flight.
+
+    Every healthy response (latency under target, windowed error rate in bounds)
+    adds 1/limit, so the limit grows by about one per round of requests. A 429,
+    5xx, timeout or slow response multiplies it by backoff_factor, at most once
+    per cooldown so a single burst of failures only counts once.
+    """
+
+    def __init__(self, initial_limit: int = 5, min_limit: int = 1, max_limit: int = 32,
+                 target_latency: float = 5.0, max_error_rate: float = 0.1,
+                 backoff_factor: float = 0.5, cooldown: float = 2.0):
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.max_error_rate = max_error_rate
+        self.backoff_factor = backoff_factor
+        self.cooldown = cooldown
+
+        self.in_flight = 0
+        self.error_rate = 0.0  # EWMA of throttled responses
+        self._last_decrease = 0.0
+        self._condition = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self) -> None:
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency: Optional[float], throttled: bool = False) -> None:
+        """Free a slot; latency None means no request was sent, so the limit is left alone"""
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            if latency is not None:
+                self._update(latency, throttled)
+            condition.notify_all()
+
+    def _update(self, latency: float, throttled: bool) -> None:
+        self.error_rate = 0.9 * self.error_rate + 0.1 * (1.0 if throttled else 0.0)
+        now = time.monotonic()
+
+        if throttled or latency > self.target_latency:
+            if now - self._last_decrease >= self.cooldown:
+                self.limit = max(float(self.min_limit), self.limit * self.backoff_factor)
+                self._last_decrease = now
+        elif self.error_rate <= self.max_error_rate:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+
+class SERPClient:
+    """Async SerpAPI client; every request waits on the shared rate limiter
+    and the adaptive concurrency limit"""
+
+    def __init__(self, api_key: str, requests_per_second: float = 5.0, burst: int = 10, timeout: float = 30,
+                 concurrency: AdaptiveConcurrencyLimiter = None, rate_limiter: TokenBucket = None):
+        self.api_key = api_key
+        self.rate_limiter = rate_limiter or TokenBucket(requests_per_second, burst)
+        self.concurrency = concurrency or AdaptiveConcurrencyLimiter()
+        self.timeout = timeout
+        self._client = None
+        self._client_loop = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(timeout=self.timeout, transport=http_transport())
+            self._client_loop = loop
+        return self._client
+
+    async def search(self, params: Dict) -> Dict:
+        """Run one SerpAPI search; params must not include the api_key"""
+        instrumentation = get_instrumentation()
+        query = {**params, 'api_key': self.api_key, 'output': 'json', 'source': 'python'}
+
+        # Slot first, token last: a token taken while still queued for a slot
+        # would let the requests behind it burst past the rate once slots free up
+        await self.concurrency.acquire()
+        started = None
+        throttled = True
+        try:
+            with instrumentation.timer('serp.rate_limit_wait'):
+                await self.rate_limiter.acquire()
+            started = time.monotonic()
+            response = await self._get_client().get(SERP_API_URL, params=query)
+            throttled = response.status_code == 429 or response.status_code >= 500
+        finally:
+            if started is None:
+                # Cancelled before the request was sent
+                await self.concurrency.release(None)
+            else:
+                latency = time.monotonic() - started
+                await self.concurrency.release(latency, throttled)
+                instrumentation.observe('serp.request', latency)
+                instrumentation.count('serp.requests')
+                if throttled:
+                    instrumentation.count('serp.throttled')
+
+        try:
+            results = response.json()
+        except ValueError:
+            raise SERPAPIError(f"Invalid JSON from SerpAPI (HTTP {response.status_code})", response.status_code)
+
+        if 'error' in results:
+            raise SERPAPIError(f"SERP API Error: {results['error']}", response.status_code)
+        if response.status_code >= 400:
+            raise SERPAPIError(f"SERP API HTTP {response.status_code}", response.status_code)
+        return results
@@ -0,0 +1,204 @@
+import asyncio
+import heapq
+import logging
+import re
+import xml.etree.ElementTree as ET
+from typing import Dict, List
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+
+from src.async_utils import run_sync
+from src.scraper import WebsiteScraper
+
+CATEGORY_HINTS = ('category', 'categories', 'collection', 'collections', 'catalog', 'department',
+                  'shop', 'products', 'services', '/c/')
+PRODUCT_HINTS = ('/p/', '/product/', '/buy', '/dp/')
+SKIP_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.pdf', '.zip', '.mp4', '.css', '.js', '.xml')
+TRACKING_PARAMS = ('gclid', 'fbclid', 'msclkid', 'ref', 'source')
+
+# Lower sorts first in the frontier
+SOURCE_PRIORITY = {'nav': 0, 'sitemap': 1, 'page': 2}
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form used for dedup: lowercase host, no fragment, no tracking params"""
+    parsed = urlparse(url)
+    host = parsed.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    path = re.sub(r'/{2,}', '/', parsed.path or '/')
+    if len(path) > 1:
+        path = path.rstrip('/')
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    )
+    return urlunparse((parsed.scheme.lower() or 'https', host, path, '', urlencode(query), ''))
+
+
+def _same_site(url: str, root_host: str) -> bool:
+    host = urlparse(url).netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    return host == root_host
+
+
+def _unique(items: List[str]) -> List[str]:
+    seen = set()
+    return [item for item in items if not (item in seen or seen.add(item))]
+
+
+class SiteCrawler:
+    """Bounded multi-page crawler built on WebsiteScraper.
+
+    Seeds from the homepage nav links and /sitemap.xml, visits category-like pages
+    first, and merges every page it reached into one content dict per site.
+    """
+
+    def __init__(self, scraper: WebsiteScraper, max_pages_per_domain: int = 20, concurrency: int = 6,
+                 time_budget: float = 30.0, use_sitemap: bool = True, max_sitemap_urls: int = 500):
+        self.scraper = scraper
+        self.max_pages_per_domain = max_pages_per_domain
+        self.concurrency = concurrency
+        self.time_budget = time_budget
+        self.use_sitemap = use_sitemap
+        self.max_sitemap_urls = max_sitemap_urls
+
+    def crawl(self, start_url: str) -> Dict:
+        """Crawl one site and return its merged content"""
+        return self.crawl_many([start_url])[0]
+
+    def crawl_many(self, start_urls: List[str]) -> List[Dict]:
+        """Crawl several sites concurrently, each within its own page and time budget"""
+        return run_sync(self.acrawl_many(start_urls))
+
+    async def acrawl_many(self, start_urls: List[str]) -> List[Dict]:
+        return await asyncio.gather(*(self.acrawl(url) for url in start_urls))
+
+    async def acrawl(self, start_url: str) -> Dict:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.time_budget
+        root_host = urlparse(normalize_url(start_url)).netloc
+
+        # The homepage and sitemap count against the time budget like every other page
+        home_task = asyncio.ensure_future(self.scraper.ascrape_many([start_url]))
+        sitemap_urls = []
+        if self.use_sitemap:
+            try:
+                sitemap_urls = await asyncio.wait_for(self._fetch_sitemap_urls(start_url),
+                                                      max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                logging.info(f"Sitemap for {start_url} not fetched within the crawl budget")
+        try:
+            home = (await asyncio.wait_for(home_task, max(deadline - loop.time(), 0)))[0]
+        except asyncio.TimeoutError:
+            return {
+                'url': start_url,
+                'error': f"Homepage not fetched within the {self.time_budget}s crawl budget",
+                'title': '',
+                'content': ''
+            }
+        if home.get('error'):
+            return home
+
+        pages = [home]
+        seen = {normalize_url(start_url), normalize_url(home['url'])}
+        frontier = []
+        counter = 0
+
+        def push(urls: List[str], base_url: str, source: str):
+            nonlocal counter
+            for link in urls:
+                absolute = urljoin(base_url, link)
+                if not absolute.startswith(('http://', 'https://')):
+                    continue
+                if not _same_site(absolute, root_host) or urlparse(absolute).path.lower().endswith(SKIP_EXTENSIONS):
+                    continue
+                normalized = normalize_url(absolute)
+                if normalized in seen:
+                    continue
+                seen.add(normalized)
+                counter += 1
+                heapq.heappush(frontier, (self._priority(normalized, source), counter, absolute))
+
+        push(home.get('nav_links', []), home['url'], 'nav')
+        push(sitemap_urls, start_url, 'sitemap')
+        push(home.get('links', []), home['url'], 'page')
+
+        while frontier and len(pages) < self.max_pages_per_domain:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+
+            batch_size = min(self.concurrency, self.max_pages_per_domain - len(pages))
+            batch = [heapq.heappop(frontier)[2] for _ in range(min(batch_size, len(frontier)))]
+            tasks = [asyncio.ensure_future(self.scraper.ascrape_many([url])) for url in batch]
+            done, pending = await asyncio.wait(tasks, timeout=remaining)
+            for task in pending:
+                task.cancel()
+
+            # Batch order, not completion order, so the merged site reads the same every run
+            for task in (task for task in tasks if task in done):
+                page = task.result()[0]
+                if page.get('error'):
+                    continue
+                pages.append(page)
+                push(page.get('nav_links', []), page['url'], 'nav')
+                push(page.get('links', []), page['url'], 'page')
+
+        print(f"  Crawled {len(pages)} pages from {root_host} ({len(frontier)} left in frontier)")
+        return self._merge(start_url, pages)
+
+    async def _fetch_sitemap_urls(self, start_url: str) -> List[str]:
+        """Page URLs from /sitemap.xml, following one level of sitemap index"""
+        sitemap_url = urljoin(start_url, '/sitemap.xml')
+        try:
+            urls, child_sitemaps = self._parse_sitemap(await self.scraper.afetch(sitemap_url))
+            # Category sitemaps are the most useful children of an index
+            child_sitemaps.sort(key=lambda url: not any(hint in url.lower() for hint in ('categor', 'collection')))
+            for child_url in child_sitemaps[:3]:
+                if len(urls) >= self.max_sitemap_urls:
+                    break
+                child_urls, _ = self._parse_sitemap(await self.scraper.afetch(child_url))
+                urls.extend(child_urls)
+            return urls[:self.max_sitemap_urls]
+        except Exception as e:
+            logging.info(f"No usable sitemap at {sitemap_url}: {e}")
+            return []
+
+    def _parse_sitemap(self, xml_bytes: bytes):
+        """Return (page urls, child sitemap urls) from a sitemap or sitemap index"""
+        root = ET.fromstring(xml_bytes)
+        locs = [el.text.strip() for el in root.iter() if el.tag.endswith('loc') and el.text]
+        if root.tag.endswith('sitemapindex'):
+            return [], locs
+        return locs, []
+
+    def _priority(self, url: str, source: str) -> int:
+        """Category and listing pages first, deep product pages last"""
+        path = urlparse(url).path.lower()
+        priority = SOURCE_PRIORITY[source] + path.count('/')
+        if any(hint in path for hint in CATEGORY_HINTS):
+            priority -= 3
+        if any(hint in path for hint in PRODUCT_HINTS) or re.search(r'\d{5,}', path):
+            priority += 3
+        return priority
+
+    def _merge(self, start_url: str, pages: List[Dict]) -> Dict:
+        """Merge page dicts into one site-level dict with the scrape_website shape"""
+        home = pages[0]
+        headings = {level: _unique([h for page in pages for h in page.get('headings', {}).get(level, [])])
+                    for level in ('h1', 'h2', 'h3')}
+        content = ' '.join(page.get('content', '') for page in pages if page.get('content'))
+
+        return {
+            'url': start_url,
+            'title': home.get('title', ''),
+            'meta_description': home.get('meta_description', ''),
+            'headings': headings,
+            'navigation': _unique([item for page in pages for item in page.get('navigation', [])]),
+            'nav_links': home.get('nav_links', []),
+            'links': home.get('links', []),
+            'content': content[:5000],  # Limit content for LLM processing
+            'content_length': sum(page.get('content_length', 0) for page in pages),
+            'pages': [page['url'] for page in pages]
+        }
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# Modules import each other as src.<module>, so the repo root must be importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.client_pool import set_transport  # noqa: E402
+
+
+@pytest.fixture
+def transport():
+    """Route shared HTTP clients through a test transport; restores the network afterwards"""
+    yield set_transport
+    set_transport(None)
@@ -0,0 +1,99 @@
+import json
+import multiprocessing
+import time
+
+import pytest
+
+from batch import BatchRunner, load_campaigns, run_campaign
+from src.serp_client import ProcessTokenBucket
+
+RATE = 50.0
+WORKERS = 3
+TOKENS_PER_WORKER = 10
+
+
+def take_tokens(bucket: ProcessTokenBucket, count: int, times) -> None:
+    for _ in range(count):
+        bucket.wait()
+        times.put(time.monotonic())
+
+
+def test_process_token_bucket_enforces_one_rate_across_processes():
+    context = multiprocessing.get_context('spawn')
+    bucket = ProcessTokenBucket(RATE, capacity=1, context=context)
+    times = context.Queue()
+    workers = [context.Process(target=take_tokens, args=(bucket, TOKENS_PER_WORKER, times))
+               for _ in range(WORKERS)]
+    for worker in workers:
+        worker.start()
+    stamps = sorted(times.get(timeout=30) for _ in range(WORKERS * TOKENS_PER_WORKER))
+    for worker in workers:
+        worker.join()
+
+    # Separate buckets would let each process take its tokens at the full rate in parallel
+    tokens = WORKERS * TOKENS_PER_WORKER
+    assert stamps[-1] - stamps[0] >= (tokens - 1) / RATE * 0.9
+
+
+def test_load_campaigns_from_directory(tmp_path):
+    (tmp_path / 'empty.yaml').write_text('')
+    (tmp_path / 'named.yaml').write_text('name: spring-sale\nbrand: {website: https://brand.test}\n')
+    (tmp_path / 'notes.txt').write_text('ignored')
+
+    campaigns = load_campaigns(str(tmp_path), {'brand': {'name': 'Brand', 'website': 'https://base.test'}})
+    assert campaigns == [
+        ('empty', {'brand': {'name': 'Brand', 'website': 'https://base.test'}}),
+        ('spring-sale', {'brand': {'name': 'Brand', 'website': 'https://brand.test'}}),
+    ]
+
+
+def test_load_campaigns_from_jsonl(tmp_path):
+    source = tmp_path / 'campaigns.jsonl'
+    source.write_text(json.dumps({'name': 'a', 'competitor': {'website': 'https://a.test'}}) + '\n\n'
+                      + json.dumps({'competitor': {'website': 'https://b.test'}}) + '\n')
+    assert [name for name, _ in load_campaigns(str(source))] == ['a', 'campaign_3']
+
+
+@pytest.mark.parametrize('name', ['../escape', '/abs', '.hidden', 'a/b', 'spaced name'])
+def test_campaign_names_must_be_safe_directory_names(tmp_path, name):
+    source = tmp_path / 'campaigns.jsonl'
+    source.write_text(json.dumps({'name': name, 'brand': {}}) + '\n')
+    with pytest.raises(ValueError, match='Invalid campaign name'):
+        load_campaigns(str(source))
+
+
+def test_campaign_configs_must_be_mappings(tmp_path):
+    (tmp_path / 'list.yaml').write_text('- brand\n- competitor\n')
+    with pytest.raises(ValueError, match='must be a mapping'):
+        load_campaigns(str(tmp_path))
+
+
+def test_duplicate_campaign_names_are_rejected(tmp_path):
+    (tmp_path / 'a.yaml').write_text('name: same\n')
+    (tmp_path / 'b.yaml').write_text('name: same\n')
+    with pytest.raises(ValueError, match='Duplicate'):
+        load_campaigns(str(tmp_path))
+
+
+def test_failed_campaign_is_reported_not_raised(tmp_path):
+    # No brand or competitor: the pipeline fails while building its stages
+    result = run_campaign('broken', {}, str(tmp_path))
+    assert result['campaign'] == 'broken'
+    assert result['status'] == 'error'
+    assert (tmp_path / 'broken' / 'pipeline.log').exists()
+
+
+def test_unwritable_output_is_reported_not_raised(tmp_path):
+    blocker = tmp_path / 'taken'
+    blocker.write_text('a file where the campaign directory should go')
+    result = run_campaign('taken', {}, str(tmp_path))
+    assert result['status'] == 'error'
+
+
+def test_batch_records_every_campaign(tmp_path):
+    runner = BatchRunner(output_dir=str(tmp_path), workers=2)
+    results = runner.run([('first', {}), ('second', {})])
+    assert sorted(result['campaign'] for result in results) == ['first', 'second']
+    assert all(result['status'] == 'error' for result in results)
+    lines = (tmp_path / 'batch_results.jsonl').read_text().splitlines()
+    assert len(lines) == 2
@@ -0,0 +1,227 @@
+import copy
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+import pytest
+import yaml
+
+from src.ad_group_builder import AdGroupBuilder
+from src.checkpoint import CheckpointStore
+from src.keyword_frame import KeywordFrame
+from src.pipeline_dag import StageDAG
+from src.replay import ReplayTransport
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_dag(store: CheckpointStore, calls: Counter, resume: bool, url: str = 'https://shop.test',
+             scale: int = 2) -> StageDAG:
+    def fetch():
+        calls['fetch'] += 1
+        return [1, 2, 3]
+
+    def scaled(values):
+        calls['scaled'] += 1
+        return [value * scale for value in values]
+
+    def total(values):
+        calls['total'] += 1
+        return sum(values)
+
+    dag = StageDAG(max_workers=2, checkpoints=store, resume=resume)
+    dag.add('fetch', fetch, config={'url': url})
+    dag.add('scaled', scaled, ['fetch'], config={'scale': scale})
+    dag.add('total', total, ['scaled'])
+    return dag
+
+
+def test_store_round_trip_and_keys(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    key = store.key('stage', {'a': 1}, ['digest'])
+    assert store.load(key) is None
+
+    digest = store.save(key, {'rows': [1, 2]})
+    assert store.load(key) == ({'rows': [1, 2]}, digest)
+    assert store.key('stage', {'a': 1}, ['digest']) == key
+    assert store.key('stage', {'a': 2}, ['digest']) != key
+    assert store.key('stage', {'a': 1}, ['other']) != key
+    assert store.key('other', {'a': 1}, ['digest']) != key
+
+
+def test_expired_checkpoints_are_ignored_and_evicted(tmp_path):
+    store = CheckpointStore(str(tmp_path), ttl=60)
+    fresh, stale = store.key('fresh', None, []), store.key('stale', None, [])
+    store.save(fresh, 'fresh')
+    store.save(stale, 'stale')
+    an_hour_ago = time.time() - 3600
+    os.utime(tmp_path / f"{stale}.pkl", (an_hour_ago, an_hour_ago))
+
+    assert store.load(stale) is None
+    assert store.stats['expired'] == 1
+    assert store.evict() == 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == [f"{fresh}.pkl"]
+    assert store.load(fresh)[0] == 'fresh'
+
+
+def test_no_ttl_never_expires(tmp_path):
+    store = CheckpointStore(str(tmp_path), ttl=None)
+    key = store.key('stage', None, [])
+    store.save(key, 'value')
+    os.utime(tmp_path / f"{key}.pkl", (0, 0))
+    assert store.load(key)[0] == 'value'
+    assert store.evict() == 0
+
+
+PICKLE_FRAME = """
+import hashlib, pickle, sys
+sys.path.insert(0, sys.argv[1])
+from src.keyword_frame import OPTIONAL_COLUMNS, KeywordFrame
+frame = KeywordFrame.from_records([dict({'keyword': 'shoes', 'avg_monthly_searches': 10},
+                                        **{name: None for name in OPTIONAL_COLUMNS})])
+print(hashlib.sha256(pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest())
+"""
+
+
+def test_frame_pickles_identically_in_every_process():
+    digests = {
+        subprocess.run([sys.executable, '-c', PICKLE_FRAME, REPO_ROOT], capture_output=True, text=True, check=True,
+                       env={**os.environ, 'PYTHONHASHSEED': str(seed)}).stdout
+        for seed in range(4)
+    }
+    assert len(digests) == 1
+
+
+def test_resume_skips_unchanged_stages(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    calls = Counter()
+    assert make_dag(store, calls, resume=True).run()['total'] == 12
+    assert calls == Counter(fetch=1, scaled=1, total=1)
+
+    dag = make_dag(store, calls, resume=True)
+    assert dag.run()['total'] == 12
+    assert calls == Counter(fetch=1, scaled=1, total=1)
+    assert all(stage.resumed for stage in dag.stages.values())
+
+
+def test_config_change_reruns_the_stage_and_its_dependents(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    calls = Counter()
+    make_dag(store, calls, resume=True).run()
+
+    dag = make_dag(store, calls, resume=True, scale=3)
+    assert dag.run()['total'] == 18
+    assert calls == Counter(fetch=1, scaled=2, total=2)
+    assert dag.stages['fetch'].resumed and not dag.stages['scaled'].resumed
+
+
+def test_identical_output_lets_dependents_resume(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    calls = Counter()
+    make_dag(store, calls, resume=True).run()
+
+    # fetch reruns for its new config but returns the same bytes, so downstream keys still match
+    make_dag(store, calls, resume=True, url='https://shop.test/?utm=1').run()
+    assert calls == Counter(fetch=2, scaled=1, total=1)
+
+
+def test_without_resume_every_stage_runs(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    calls = Counter()
+    make_dag(store, calls, resume=True).run()
+    make_dag(store, calls, resume=False).run()
+    assert calls == Counter(fetch=2, scaled=2, total=2)
+
+
+class FixedCategories:
+    """LLMHelper stand-in that files keywords by the first word"""
+
+    def categorize_keywords(self, keywords, check_cache=True):
+        categorized = {}
+        for kw in keywords:
+            category = 'competitor_terms' if kw['keyword'].startswith('ajio') else 'category_terms'
+            categorized.setdefault(category, []).append(kw)
+        return categorized
+
+
+def test_ad_groups_leave_the_checkpointed_input_untouched():
+    records = [{'keyword': keyword, 'avg_monthly_searches': 5000, 'competition': 'LOW', 'competition_score': 0.2,
+                'top_of_page_bid_low': 10, 'top_of_page_bid_high': 40, 'total_results': 1000}
+               for keyword in ('running shoes', 'ajio shoes', 'sneakers online')]
+    scored = KeywordFrame.from_records(records)
+    before = copy.deepcopy(scored.to_records())
+
+    builder = AdGroupBuilder({'keyword_settings': {'conversion_rate': 0.02}}, llm_helper=FixedCategories())
+    annotated, ad_groups = builder.annotate_and_group(scored)
+
+    assert scored.to_records() == before
+    assert 'match_types' not in scored.present
+    assert sorted(ad_groups) == ['category_terms', 'competitor_terms']
+    assert all('match_types' in record and 'category' in record for record in annotated.to_records())
+    assert np.array_equal(annotated['keyword'], scored['keyword'])
+
+
+@pytest.fixture
+def pipeline_config(tmp_path, monkeypatch, transport):
+    """Offline pipeline config: replayed APIs, caches and checkpoints under tmp_path"""
+    monkeypatch.setenv('SERP_API_KEY', 'replay')
+    monkeypatch.setenv('OPENAI_API_KEY', 'replay')
+    monkeypatch.delenv('OPENAI_BASE_URL', raising=False)
+    transport(ReplayTransport(str(tmp_path / 'fixtures')))
+
+    with open(os.path.join(REPO_ROOT, 'config.yaml'), 'r') as f:
+        config = yaml.safe_load(f)
+    config['cache'] = {'directory': str(tmp_path / 'cache')}
+    config['serp_api'].update(requests_per_second=1000, burst=1000)
+    config['llm']['requests_per_second'] = 1000
+    return config
+
+
+def test_pipeline_resume_reproduces_every_export(pipeline_config):
+    from main import SEMKeywordPipeline
+
+    weights = {'search_volume_weight': 0.2, 'competition_weight': 0.6, 'cpc_weight': 0.2}
+    first = SEMKeywordPipeline(config_dict=copy.deepcopy(pipeline_config))
+    _, _, files = first.run_pipeline(resume=True)
+    _, _, rescored = first.rescore(weights)
+
+    second = SEMKeywordPipeline(config_dict=copy.deepcopy(pipeline_config))
+    _, _, resumed_files = second.run_pipeline(resume=True)
+    _, _, resumed_rescored = second.rescore(weights)
+
+    assert all(stage['resumed'] for stage in second.run_profile['stages'].values())
+    for name in ('keywords_master.csv', 'ad_groups_search.json'):
+        assert resumed_files[name] == files[name]
+        assert resumed_rescored[name] == rescored[name]
+    # The master export keeps the ad group columns after a resume and a rescore
+    header = files['keywords_master.csv'].splitlines()[0]
+    assert 'match_types' in header and 'category' in header
+    assert resumed_rescored['keywords_master.csv'].splitlines()[0] == header
+
+
+def test_stage_config_only_covers_what_the_stage_reads(pipeline_config):
+    from main import SEMKeywordPipeline
+
+    def stage_configs(config):
+        dag = SEMKeywordPipeline(config_dict=config)._build_dag()
+        return {name: stage.config for name, stage in dag.stages.items()}
+
+    changed = copy.deepcopy(pipeline_config)
+    changed['keyword_settings']['conversion_rate'] = 0.05
+    changed['llm']['local_min_margin'] = 0.2
+    before, after = stage_configs(copy.deepcopy(pipeline_config)), stage_configs(changed)
+
+    assert [name for name in before if before[name] != after[name]] == ['ad_groups']
+
+
+def test_untrained_local_categorizer_is_not_reused(pipeline_config):
+    from main import SEMKeywordPipeline
+
+    # The fresh LLM cache has no labels yet, so each pipeline retrains instead of keeping the empty model
+    first = SEMKeywordPipeline(config_dict=copy.deepcopy(pipeline_config)).ad_group_builder.local_categorizer
+    second = SEMKeywordPipeline(config_dict=copy.deepcopy(pipeline_config)).ad_group_builder.local_categorizer
+    assert not first.is_trained
+    assert second is not first
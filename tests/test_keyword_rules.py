@@ -0,0 +1,56 @@
+import re
+
+import pytest
+
+from src.keyword_rules import RULE_TERMS, RULES, KeywordMatcher, location_matcher, rule_mask
+
+KEYWORDS = [
+    'buy running shoes online', 'shoes near me', 'how to choose sneakers', 'nike vs adidas',
+    'border collie', 'online shoe store', 'shoe repair in mumbai', 'best price watches',
+    'kurta reviews', 'tips for formal wear', 'local plumbers', 'real estate agents pune',
+    'jeans', '', 'Compare PRICES', 'orders tracking', 'dentist', 'free delivery t shirts',
+]
+
+
+def reference_mask(keyword: str) -> int:
+    """One regex per term, the slow way the matcher replaces"""
+    mask = 0
+    for name, terms in RULE_TERMS.items():
+        for term in terms:
+            if re.search(rf"(?<!\w){re.escape(term)}(?:e?s)?(?!\w)", keyword.lower()):
+                mask |= RULES.bits[name]
+    return mask
+
+
+@pytest.mark.parametrize('keyword', KEYWORDS)
+def test_matches_per_term_reference(keyword):
+    assert rule_mask(keyword) == reference_mask(keyword)
+
+
+def test_terms_match_whole_words_only():
+    assert not RULES.has(rule_mask('online shoe store'), 'location_intent')  # 'in' inside 'online'
+    assert not RULES.has(rule_mask('border collie'), 'transactional')  # 'order' inside 'border'
+    assert RULES.has(rule_mask('shoe repair in mumbai'), 'location_intent')
+
+
+def test_plurals_and_multi_word_terms():
+    assert RULES.has(rule_mask('kurta reviews'), 'informational')
+    assert RULES.has(rule_mask('Compare PRICES'), 'commercial')
+    mask = rule_mask('shoes near me')
+    assert RULES.has(mask, 'convenience') and RULES.has(mask, 'location_relevant')
+
+
+def test_masks_matches_mask():
+    assert RULES.masks(KEYWORDS).tolist() == [RULES.mask(keyword) for keyword in KEYWORDS]
+
+
+def test_empty_rules_match_nothing():
+    assert KeywordMatcher({}).mask('anything') == 0
+
+
+def test_location_matcher_is_built_once_per_city_list():
+    cities = ('mumbai', 'pune')
+    matcher = location_matcher(cities)
+    assert matcher is location_matcher(cities)
+    assert matcher.has(matcher.mask('shoe repair in Pune'), 'city')
+    assert not matcher.mask('punekar sarees')  # Whole words only
@@ -0,0 +1,25 @@
+import queue
+import threading
+
+from src.profiling import ThreadedProfile
+
+
+def spin(n: int) -> int:
+    return sum(i * i for i in range(n))
+
+
+def test_cprofile_table_covers_worker_threads_but_not_idle_waits():
+    work = queue.Queue()
+    worker = threading.Thread(target=lambda: spin(work.get()))
+
+    profiler = ThreadedProfile()
+    profiler.start()
+    worker.start()
+    threading.Event().wait(0.2)  # The worker sits in queue.get meanwhile
+    work.put(200_000)
+    worker.join()
+    profiler.stop()
+
+    table = profiler.top_table(50)
+    assert 'spin' in table
+    assert 'acquire' not in table and 'queue.py' not in table
@@ -0,0 +1,79 @@
+import csv
+
+import pytest
+
+from src.keyword_frame import COMPETITION_LEVELS
+from src.keyword_research import SERPKeywordResearcher
+from src.serp_cache import SERPCache, reestimate_metrics
+
+KEYWORDS = ['shoes', 'buy shoes online', 'how to clean white sneakers at home', 'nike vs adidas',
+            'shoe repair near me', 'kurta', 'cheap t shirts for men in delhi']
+TOTALS = [0, 999, 5_000, 2_000_000, 50_000_000, 150_000_000, 3_000_000_000]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SERPCache(str(tmp_path / 'serp_cache.sqlite3'))
+    yield cache
+    cache.close()
+
+
+def scalar_metrics(keyword: str, total_results: int) -> tuple:
+    # The per-keyword heuristics don't touch instance state, so skip the API key check
+    researcher = SERPKeywordResearcher.__new__(SERPKeywordResearcher)
+    competition = researcher._estimate_competition(total_results)
+    low, high = researcher._estimate_cpc(keyword, competition)
+    return (researcher._estimate_search_volume(keyword, total_results), competition,
+            researcher._competition_to_score(competition), low, high)
+
+
+def test_batch_estimates_match_per_keyword_methods():
+    keywords = [keyword for keyword in KEYWORDS for _ in TOTALS]
+    totals = TOTALS * len(KEYWORDS)
+    metrics = SERPKeywordResearcher.estimate_metrics_batch(keywords, totals)
+
+    for i, (keyword, total) in enumerate(zip(keywords, totals)):
+        batch = (int(metrics['avg_monthly_searches'][i]), COMPETITION_LEVELS[metrics['competition'][i]],
+                 float(metrics['competition_score'][i]), int(metrics['top_of_page_bid_low'][i]),
+                 int(metrics['top_of_page_bid_high'][i]))
+        assert batch == scalar_metrics(keyword, total), (keyword, total)
+
+
+def test_search_totals_skip_site_queries_and_other_engines(cache):
+    cache.set({'engine': 'google', 'q': 'running shoes', 'location': 'India'},
+              {'search_information': {'total_results': 12_000}})
+    cache.set({'engine': 'google', 'q': 'site:ajio.com', 'location': 'India'},
+              {'search_information': {'total_results': 80}})
+    cache.set({'engine': 'google', 'q': 'Site:myntra.com'}, {'search_information': {'total_results': 80}})
+    cache.set({'engine': 'google_autocomplete', 'q': 'running'}, {'suggestions': []})
+
+    rows = [row for batch in cache.iter_search_totals() for row in batch]
+    assert [(query, total) for query, _, total in rows] == [('running shoes', 12_000)]
+
+
+def test_search_totals_page_through_every_row(cache):
+    for i in range(7):
+        cache.set({'engine': 'google', 'q': f"keyword {i}"}, {'search_information': {'total_results': i}})
+        cache.set({'engine': 'google', 'q': f"site:shop{i}.com"}, {'search_information': {'total_results': i}})
+
+    batches = list(cache.iter_search_totals(batch_size=3))
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert [query for batch in batches for query, _, _ in batch] == [f"keyword {i}" for i in range(7)]
+
+
+def test_reestimate_writes_one_row_per_cached_search(cache, tmp_path):
+    for keyword, total in zip(KEYWORDS, TOTALS):
+        cache.set({'engine': 'google', 'q': keyword, 'location': 'India'},
+                  {'search_information': {'total_results': total}})
+    cache.set({'engine': 'google', 'q': 'site:ajio.com'}, {'search_information': {'total_results': 80}})
+
+    output = tmp_path / 'metrics.csv'
+    assert reestimate_metrics(cache, str(output), batch_size=4) == len(KEYWORDS)
+
+    with open(output, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['keyword'] for row in rows] == KEYWORDS
+    for row, keyword, total in zip(rows, KEYWORDS, TOTALS):
+        volume, competition, _, low, high = scalar_metrics(keyword, total)
+        assert (int(row['avg_monthly_searches']), row['competition'], int(row['top_of_page_bid_low']),
+                int(row['top_of_page_bid_high']), int(row['total_results'])) == (volume, competition, low, high, total)
@@ -0,0 +1,144 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.async_utils import run_sync
+from src.serp_client import AdaptiveConcurrencyLimiter, SERPClient, SingleFlight, TokenBucket
+
+
+def serp_ok(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={'search_information': {'total_results': 1000}})
+
+
+class RecordingBucket(TokenBucket):
+    """Records how many concurrency slots are held whenever a token is requested"""
+
+    def __init__(self, concurrency: AdaptiveConcurrencyLimiter, rate: float = 1000, delay: float = 0):
+        super().__init__(rate, capacity=1000)
+        self.concurrency = concurrency
+        self.delay = delay
+        self.in_flight_at_acquire = []
+
+    async def acquire(self) -> None:
+        self.in_flight_at_acquire.append(self.concurrency.in_flight)
+        await asyncio.sleep(self.delay)
+        await super().acquire()
+
+
+def test_token_is_taken_after_the_concurrency_slot(transport):
+    transport(httpx.MockTransport(serp_ok))
+    concurrency = AdaptiveConcurrencyLimiter(initial_limit=2)
+    bucket = RecordingBucket(concurrency)
+    client = SERPClient('key', concurrency=concurrency, rate_limiter=bucket)
+
+    async def search_all():
+        return await asyncio.gather(*(client.search({'q': f"keyword {i}"}) for i in range(6)))
+
+    results = run_sync(search_all())
+    assert len(results) == 6
+    # Every request held a slot before asking for its token, and no more than the limit ran
+    assert len(bucket.in_flight_at_acquire) == 6
+    assert all(1 <= held <= 2 for held in bucket.in_flight_at_acquire)
+    assert concurrency.in_flight == 0
+
+
+def test_cancelled_token_wait_frees_the_slot_without_a_sample(transport):
+    transport(httpx.MockTransport(serp_ok))
+    concurrency = AdaptiveConcurrencyLimiter(initial_limit=1)
+    client = SERPClient('key', concurrency=concurrency, rate_limiter=RecordingBucket(concurrency, delay=10))
+
+    async def cancel_while_waiting():
+        task = asyncio.ensure_future(client.search({'q': 'shoes'}))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    run_sync(cancel_while_waiting())
+    assert concurrency.in_flight == 0
+    assert concurrency.limit == 1.0
+    assert concurrency.error_rate == 0.0
+
+
+def test_limit_grows_on_healthy_responses_and_halves_on_throttling():
+    concurrency = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=8, cooldown=0)
+
+    async def round_trip(latency, throttled):
+        await concurrency.acquire()
+        await concurrency.release(latency, throttled)
+
+    run_sync(round_trip(0.1, False))
+    assert concurrency.limit == pytest.approx(4.25)
+
+    run_sync(round_trip(0.1, True))
+    assert concurrency.limit == pytest.approx(2.125)
+
+    # Slow responses count as congestion too
+    run_sync(round_trip(concurrency.target_latency + 1, False))
+    assert concurrency.limit == pytest.approx(1.0625)
+
+
+def test_release_without_latency_leaves_the_limit_alone():
+    concurrency = AdaptiveConcurrencyLimiter(initial_limit=3)
+
+    async def acquire_and_release():
+        await concurrency.acquire()
+        await concurrency.release(None)
+
+    run_sync(acquire_and_release())
+    assert concurrency.limit == 3.0
+    assert concurrency.in_flight == 0
+
+
+def test_cancelling_the_first_caller_leaves_other_waiters_running():
+    flight = SingleFlight()
+    calls = []
+
+    async def slow_search():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'results'
+
+    async def cancel_leader():
+        leader = asyncio.ensure_future(flight.do('shoes', slow_search))
+        follower = asyncio.ensure_future(flight.do('shoes', slow_search))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert run_sync(cancel_leader()) == 'results'
+    assert calls == [1]
+    assert flight.saved_calls == 1
+    assert not flight._inflight
+
+
+def test_call_is_cancelled_once_every_caller_gives_up():
+    flight = SingleFlight()
+    cancelled = []
+
+    async def hanging_search():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def cancel_all():
+        callers = [asyncio.ensure_future(flight.do('shoes', hanging_search)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0.01)
+
+    run_sync(cancel_all())
+    assert cancelled == [1]
+    assert not flight._inflight
+
+
+def test_initial_limit_is_clamped_to_the_bounds():
+    assert AdaptiveConcurrencyLimiter(initial_limit=5, max_limit=2).limit == 2.0
+    assert AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=3).limit == 3.0
@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+import httpx
+
+from src.scraper import WebsiteScraper
+from src.site_crawler import SiteCrawler
+
+HOME = b'<html><head><title>Shop</title></head><body><h1>Shop</h1><a href="/shoes">Shoes</a></body></html>'
+
+
+def slow_site(sitemap_delay: float = 0, home_delay: float = 0):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == '/sitemap.xml':
+            await asyncio.sleep(sitemap_delay)
+            return httpx.Response(404)
+        await asyncio.sleep(home_delay)
+        return httpx.Response(200, content=HOME, headers={'content-type': 'text/html'})
+    return handler
+
+
+def test_slow_sitemap_does_not_outlast_the_time_budget(transport):
+    transport(httpx.MockTransport(slow_site(sitemap_delay=10)))
+    crawler = SiteCrawler(WebsiteScraper(), max_pages_per_domain=1, time_budget=0.3)
+
+    started = time.monotonic()
+    site = crawler.crawl('https://shop.test')
+    assert time.monotonic() - started < 2
+    assert not site.get('error')
+    assert site['title'] == 'Shop'
+
+
+def test_homepage_that_outlasts_the_time_budget_is_an_error(transport):
+    transport(httpx.MockTransport(slow_site(home_delay=10)))
+    crawler = SiteCrawler(WebsiteScraper(), time_budget=0.3)
+
+    started = time.monotonic()
+    site = crawler.crawl('https://shop.test')
+    assert time.monotonic() - started < 2
+    assert 'crawl budget' in site['error']